@@ -0,0 +1,115 @@
+"""
+Deterministic fast paths for the OrderAgent.
+This file contains checks that can answer a user turn locally, without an LLM round trip.
+"""
+
+import re
+import logging
+
+logger = logging.getLogger("db_operations")
+
+# A bare confirmation such as "yes", "yeah.", "that's right!" or "okay"
+confirm_regex = re.compile(
+    r"^\s*(y(es|ep|eah)?|correct|that'?s (right|correct)|right|sure|ok(ay)?|confirmed?)[\s.,!]*$",
+    re.IGNORECASE,
+)
+
+# Scripted reply for each confirmation question the handlers can ask
+CONFIRMATION_REPLIES = {
+    "phone": "Great! Would you like to hear our menu?",
+}
+
+
+def confirmation_fast_path(agent, request):
+    """
+    Answer a pending confirmation question without calling the LLM.
+
+    Args:
+        agent: The OrderAgent instance
+        request: The ResponseRequiredRequest for the current turn
+
+    Returns:
+        The reply text if the user's turn is a plain confirmation, otherwise None
+    """
+    if request.interaction_type != "response_required":
+        return None
+
+    # Whatever the user says, the pending question has now been answered
+    pending = agent.pending_confirmation
+    agent.pending_confirmation = None
+
+    if not pending:
+        return None
+    if not request.transcript or request.transcript[-1].role != "user":
+        return None
+
+    if not confirm_regex.match(request.transcript[-1].content):
+        return None
+
+    logger.info(f"Confirmation fast path taken for pending '{pending}' question")
+    return CONFIRMATION_REPLIES.get(pending)
+
+
+# Number of consecutive turns without a tool call that counts as a loop
+LOOP_TURN_LIMIT = 2
+
+# An agent message that asks the customer to confirm something
+confirm_question_regex = re.compile(
+    r"(is (that|this)( information| order)? correct|confirm|is that right|is that your complete order)",
+    re.IGNORECASE,
+)
+
+LOOP_BREAKER_MESSAGE = "The customer has already confirmed. Do not ask for confirmation again; proceed to the next step now."
+
+
+class StateMutationTracker:
+    """
+    Detect confirmation loops outside the LLM.
+
+    A loop is the customer answering "yes" to a confirmation question while
+    several turns have passed without any tool call moving the order forward.
+    """
+
+    def __init__(self):
+        self.turn = 0
+        self.last_tool_call_turn = 0
+
+    def start_turn(self):
+        self.turn += 1
+
+    def record_tool_call(self):
+        self.last_tool_call_turn = self.turn
+
+    def loop_breaker(self, transcript):
+        """
+        Check whether the conversation is stuck confirming the same thing.
+
+        Args:
+            transcript: The list of Utterances for the current turn
+
+        Returns:
+            A (system_message, tool_choice) tuple forcing progress, or None
+        """
+        if self.turn - self.last_tool_call_turn < LOOP_TURN_LIMIT:
+            return None
+        if len(transcript) < 2:
+            return None
+
+        last_agent, last_user = transcript[-2], transcript[-1]
+        if last_agent.role != "agent" or last_user.role != "user":
+            return None
+        if not confirm_regex.match(last_user.content):
+            return None
+        if not confirm_question_regex.search(last_agent.content):
+            return None
+
+        logger.warning(
+            f"Confirmation loop detected after {self.turn - self.last_tool_call_turn} turns without a tool call"
+        )
+
+        # A confirmed order summary (it quotes prices) can only lead to placing the order
+        tool_choice = None
+        if "$" in last_agent.content and "order" in last_agent.content.lower():
+            tool_choice = {"type": "function", "function": {"name": "create_order"}}
+
+        return LOOP_BREAKER_MESSAGE, tool_choice
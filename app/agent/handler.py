@@ -3,15 +3,33 @@ Function handlers for the OrderAgent class.
 This file contains implementations of tool functions used by the restaurant order system.
 """
 
+import hashlib
 import json
 import logging
 
+from .menu_index import AddOnMatcher
+
 # Get logger reference
 logger = logging.getLogger("db_operations")
 conversation_logger = logging.getLogger("conversation")
 tool_logger = logging.getLogger("tool_calls")
 response_logger = logging.getLogger("responses")
 
+# Order in which add-on types are presented
+ADDON_TYPE_ORDER = ("size", "sauce", "topping", "other")
+
+# Read-only menu lookups whose replies can be replayed when the LLM repeats them
+# with the same arguments; the menu does not change during a call. Tool replies
+# are spoken to the caller, so a repeat says the same words again and only the
+# database lookup is skipped.
+DEDUP_TOOLS = {"verify_menu_item", "get_item_addons"}
+
+
+def tool_call_hash(func_name, arguments):
+    """Return a short hash of a tool call and its arguments, used as the tool_cache key."""
+    payload = json.dumps([func_name, arguments], sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
 
 def verify_menu_item_function(agent, params):
     """
@@ -33,25 +51,10 @@ def verify_menu_item_function(agent, params):
 
     # If no exact match, try fuzzy matching
     if not menu_item:
-        # Get all menu items and find potential matches
-        all_menu_items = agent.menu_items
-        potential_matches = []
-
-        for item in all_menu_items:
-            # Skip items that aren't available
-            if getattr(item, "is_available", 1) == 0:
-                continue
-
-            # Check if category matches (if specified)
-            if category and item.category.lower() != category.lower():
-                continue
-
-            # Check if item name is in the query or query is in the item name
-            if (
-                item.name.lower() in item_name.lower()
-                or item_name.lower() in item.name.lower()
-            ):
-                potential_matches.append(item)
+        category_lower = category.lower() if category else None
+        potential_matches = agent.menu_index.matches(
+            item_name.lower(), category_lower
+        )
 
         # If we found potential matches, use the first one
         if potential_matches:
@@ -101,9 +104,8 @@ def verify_menu_item_function(agent, params):
 
         # Order the add-on types: size first, then sauce, then toppings
         response["add_ons"] = {}
-        type_order = ["size", "sauce", "topping", "other"]
 
-        for addon_type in type_order:
+        for addon_type in ADDON_TYPE_ORDER:
             if addon_type in addon_by_type:
                 response["add_ons"][addon_type] = addon_by_type[addon_type]
 
@@ -131,46 +133,45 @@ async def handle_function_call(agent, request, func_call, func_arguments):
         f"CONV_ID:{agent.conversation_id} TOOL_CALL_COMPLETE:func={func_name} args={json.dumps(func_call['arguments'])}"
     )
 
-    # Call the appropriate handler based on function name
-    if func_name == "verify_customer":
-        async for response in handle_verify_customer(
-            agent, request, func_call["arguments"]
-        ):
-            yield response
-
-    elif func_name == "collect_customer_info":
-        async for response in handle_collect_customer_info(
-            agent, request, func_call["arguments"]
+    if func_name not in DEDUP_TOOLS:
+        async for response in _dispatch_function_call(
+            agent, request, func_name, func_call["arguments"]
         ):
             yield response
+        return
 
-    elif func_name == "get_order_history":
-        async for response in handle_get_order_history(
-            agent, request, func_call["arguments"]
-        ):
-            yield response
+    # Replay the earlier reply to a repeated lookup instead of querying the database again
+    call_hash = tool_call_hash(func_name, func_call["arguments"])
+    cached = agent.tool_cache.get(call_hash)
+    if cached is not None:
+        tool_logger.info(
+            f"CONV_ID:{agent.conversation_id} TOOL_CALL_DEDUP:func={func_name} hash={call_hash}"
+        )
+        for content, content_complete, end_call in cached:
+            yield agent.create_response(
+                request.response_id, content, content_complete, end_call
+            )
+        return
 
-    elif func_name == "verify_menu_item":
-        async for response in handle_verify_menu_item(
-            agent, request, func_call["arguments"]
-        ):
-            yield response
+    replies = []
+    async for response in _dispatch_function_call(
+        agent, request, func_name, func_call["arguments"]
+    ):
+        replies.append(
+            (response.content, response.content_complete, response.end_call)
+        )
+        yield response
+    agent.tool_cache[call_hash] = replies
 
-    elif func_name == "create_order":
-        async for response in handle_create_order(
-            agent, request, func_call["arguments"]
-        ):
-            yield response
 
-    elif func_name == "end_call":
-        async for response in handle_end_call(agent, request, func_call["arguments"]):
-            yield response
+async def _dispatch_function_call(agent, request, func_name, arguments):
+    """Call the handler for func_name and yield its responses."""
+    handler = FUNCTION_HANDLERS.get(func_name)
+    if handler is None:
+        return
 
-    elif func_name == "get_item_addons":
-        async for response in handle_get_item_addons(
-            agent, request, func_call["arguments"]
-        ):
-            yield response
+    async for response in handler(agent, request, arguments):
+        yield response
 
 
 async def handle_verify_customer(agent, request, arguments):
@@ -204,6 +205,7 @@ async def handle_verify_customer(agent, request, arguments):
             return
 
         logger.info(f"Verifying customer with phone: {phone_str}")
+        agent.customer_identified = True
         customer = agent.db.get_customer_by_phone(phone_str)
 
         if customer:
@@ -226,6 +228,7 @@ async def handle_verify_customer(agent, request, arguments):
                 response_text += " "
             else:
                 response_text += f" Your phone number is {phone_str}, is that correct? "
+                agent.pending_confirmation = "phone"
 
             # Only include optional fields if they exist and have values
             if (
@@ -276,7 +279,7 @@ async def handle_verify_customer(agent, request, arguments):
                     logger.info(f"Created new customer: {name} with phone: {phone_str}")
 
                     # Skip phone confirmation and go straight to menu
-                    restaurant = agent.db.get_restaurant()
+                    restaurant = agent.get_restaurant()
                     pickup_address = (
                         restaurant.address if restaurant else "our restaurant"
                     )
@@ -297,6 +300,7 @@ async def handle_verify_customer(agent, request, arguments):
                     )
             else:
                 # For manually entered phone numbers, verify with the customer
+                agent.pending_confirmation = "phone"
                 yield agent.create_response(
                     request.response_id,
                     f"Nice to meet you, {name}! I've got your phone number as {phone_str}, is that correct?",
@@ -349,7 +353,7 @@ async def handle_collect_customer_info(agent, request, arguments):
             return
 
         # Process the customer info with the validated phone number
-        customer = agent.db.get_customer_by_phone(phone_str)
+        agent.customer_identified = True
 
         customer_data = {
             "name": arguments["name"],
@@ -357,29 +361,18 @@ async def handle_collect_customer_info(agent, request, arguments):
             "preferred_payment_method": arguments.get("preferred_payment_method"),
         }
 
-        if customer:
-            logger.info(f"Updating existing customer: {customer.name}")
-            try:
-                customer = agent.db.update_customer(
-                    phone_str, auto_commit=True, **customer_data
-                )
-            except Exception as e:
-                agent.db.session.rollback()
-                logger.error(f"Error updating customer: {str(e)}")
-                import traceback
-
-                logger.error(f"Traceback: {traceback.format_exc()}")
-        else:
-            logger.info(f"Creating new customer with phone: {phone_str}")
-            customer_data["phone"] = phone_str
-            try:
-                customer = agent.db.create_customer(**customer_data, auto_commit=True)
-            except Exception as e:
-                agent.db.session.rollback()
-                logger.error(f"Error creating customer: {str(e)}")
-                import traceback
+        # Create or update in one INSERT ... ON CONFLICT, with no lookup first
+        logger.info(f"Saving customer with phone: {phone_str}")
+        try:
+            customer = agent.db.upsert_customer(
+                phone=phone_str, auto_commit=True, **customer_data
+            )
+        except Exception as e:
+            agent.db.session.rollback()
+            logger.error(f"Error saving customer: {str(e)}")
+            import traceback
 
-                logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.error(f"Traceback: {traceback.format_exc()}")
 
         yield agent.create_response(
             request.response_id,
@@ -473,28 +466,14 @@ async def handle_get_item_addons(agent, request, arguments):
     item_name = arguments["item_name"]
 
     # Attempt to find the menu item with more flexible matching
-    menu_item = None
-    all_menu_items = agent.menu_items
+    item_name_lower = item_name.lower()
 
     # First try exact match
-    for item in all_menu_items:
-        if (
-            item.name.lower() == item_name.lower()
-            and getattr(item, "is_available", 1) == 1
-        ):
-            menu_item = item
-            break
+    menu_item = agent.menu_index.available_by_name.get(item_name_lower)
 
     # If no exact match, try partial match
     if not menu_item:
-        potential_matches = []
-        for item in all_menu_items:
-            if getattr(item, "is_available", 1) == 1 and (
-                item.name.lower() in item_name.lower()
-                or item_name.lower() in item.name.lower()
-            ):
-                potential_matches.append(item)
-
+        potential_matches = agent.menu_index.matches(item_name_lower)
         if potential_matches:
             menu_item = potential_matches[0]
 
@@ -525,33 +504,26 @@ async def handle_get_item_addons(agent, request, arguments):
                     addon_by_type[addon_type] = []
                 addon_by_type[addon_type].append(addon)
 
-            # Start with asking about size if available
-            if "size" in addon_by_type:
-                size_options = addon_by_type["size"]
-                response_text += "First, let's choose a size. "
-                if len(size_options) > 1:
-                    response_text += f"We have {', '.join([addon.name for addon in size_options[:-1]])}, and {size_options[-1].name}. "
-                else:
-                    response_text += f"We offer {size_options[0].name}. "
-                response_text += "Which size would you prefer?"
-            # If no size options, proceed to the next add-on type in sequence
-            elif "sauce" in addon_by_type:
-                sauce_options = addon_by_type["sauce"]
-                response_text += "Let's talk about sauce options. "
-                if len(sauce_options) > 1:
-                    response_text += f"We have {', '.join([addon.name for addon in sauce_options[:-1]])}, and {sauce_options[-1].name}. "
+            # Offer every applicable add-on type in one question, in the usual
+            # size, sauce, topping order, so a caller can answer them all at once
+            type_labels = {"size": "size", "sauce": "sauce", "topping": "toppings"}
+            offered = [t for t in ("size", "sauce", "topping") if t in addon_by_type]
+            if offered:
+                option_texts = []
+                for addon_type in offered:
+                    names = [addon.name for addon in addon_by_type[addon_type]]
+                    if len(names) > 1:
+                        names_text = f"{', '.join(names[:-1])} or {names[-1]}"
+                    else:
+                        names_text = names[0]
+                    option_texts.append(f"for {type_labels[addon_type]}, {names_text}")
+                labels = [type_labels[t] for t in offered]
+                if len(labels) > 1:
+                    question = f"{', '.join(labels[:-1])} and {labels[-1]}"
                 else:
-                    response_text += f"We offer {sauce_options[0].name}. "
-                response_text += "Which sauce would you like?"
-            # If no size or sauce options, proceed to toppings
-            elif "topping" in addon_by_type:
-                topping_options = addon_by_type["topping"]
-                response_text += "You can add delicious toppings to your order. "
-                if len(topping_options) > 1:
-                    response_text += f"We have {', '.join([addon.name for addon in topping_options[:-1]])}, and {topping_options[-1].name}. "
-                else:
-                    response_text += f"We offer {topping_options[0].name}. "
-                response_text += "Would you like to add any toppings?"
+                    question = labels[0]
+                response_text += f"We have {'; '.join(option_texts)}. "
+                response_text += f"What {question} would you like?"
             else:
                 # If no add-ons by type, simply ask if they want anything else
                 response_text += "Would you like to order anything else?"
@@ -636,9 +608,16 @@ async def handle_create_order(agent, request, arguments):
         # Collect special instructions for the whole order
         order_special_instructions = arguments.get("special_instructions", "")
 
+        # Add-on matchers per category, so each category is loaded once per order
+        addon_matchers = {}
+
+        # Get menu item details including IDs from database for all items at once
+        menu_items_by_name = agent.db.find_similar_menu_items_bulk(
+            [item["item_name"] for item in raw_order_items]
+        )
+
         for item in raw_order_items:
-            # Get menu item details including ID from database
-            menu_item = agent.db.find_similar_menu_item(item["item_name"])
+            menu_item = menu_items_by_name.get(item["item_name"].lower())
 
             if not menu_item or getattr(menu_item, "is_available", 1) == 0:
                 logger.warning(
@@ -654,45 +633,31 @@ async def handle_create_order(agent, request, arguments):
             total_add_on_price = 0
             item_special_instructions = item.get("special_instructions", "")
 
-            for addon_name in item.get("add_ons", []):
-                # Find add-on in database to get its ID and price
-                add_ons = agent.db.get_add_ons(menu_item.category)
-
-                # First try exact match
-                addon = next(
-                    (a for a in add_ons if a.name.lower() == addon_name.lower()),
-                    None,
-                )
+            # Find add-ons in database to get their IDs and prices
+            addon_matcher = addon_matchers.get(menu_item.category)
+            if addon_matcher is None:
+                addon_matcher = AddOnMatcher(agent.db.get_add_ons(menu_item.category))
+                addon_matchers[menu_item.category] = addon_matcher
 
-                # If no exact match, try to extract the core add-on name
-                # This handles cases like "extra bacon" -> "bacon"
-                if not addon:
-                    # Try to find a partial match
-                    matching_addons = [
-                        a
-                        for a in add_ons
-                        if a.name.lower() in addon_name.lower()
-                        or addon_name.lower() in a.name.lower()
-                    ]
-
-                    if matching_addons:
-                        # Use the first matching add-on
-                        addon = matching_addons[0]
-
-                        # Extract modifier words like "extra", "light", etc.
-                        modifier_words = (
-                            addon_name.lower().replace(addon.name.lower(), "").strip()
-                        )
-                        if modifier_words:
-                            # Add to item special instructions if not empty
-                            if item_special_instructions:
-                                item_special_instructions += (
-                                    f", {modifier_words} {addon.name}"
-                                )
-                            else:
-                                item_special_instructions = (
-                                    f"{modifier_words} {addon.name}"
-                                )
+            for addon_name in item.get("add_ons", []):
+                addon_name_lower = addon_name.lower()
+                addon, contained = addon_matcher.match(addon_name_lower)
+
+                # A partial match like "extra bacon" -> "bacon" keeps its
+                # modifier words as a special instruction
+                if contained:
+                    # Extract modifier words like "extra", "light", etc.
+                    modifier_words = addon_name_lower.replace(
+                        addon.name.lower(), ""
+                    ).strip()
+                    if modifier_words:
+                        # Add to item special instructions if not empty
+                        if item_special_instructions:
+                            item_special_instructions += (
+                                f", {modifier_words} {addon.name}"
+                            )
+                        else:
+                            item_special_instructions = f"{modifier_words} {addon.name}"
 
                 if addon:
                     formatted_add_ons.append(
@@ -757,8 +722,8 @@ async def handle_create_order(agent, request, arguments):
             if "payment_method" in arguments:
                 order_data["payment_method"] = arguments["payment_method"]
 
-            # Get restaurant information for pickup address
-            restaurant = agent.db.get_restaurant()
+            # Get restaurant information for pickup address (cached on the agent)
+            restaurant = agent.get_restaurant()
             pickup_address = (
                 restaurant.address
                 if restaurant
@@ -822,3 +787,15 @@ async def handle_create_order(agent, request, arguments):
             content_complete=True,
             end_call=False,
         )
+
+
+# Tool name -> handler, looked up once per tool call by _dispatch_function_call
+FUNCTION_HANDLERS = {
+    "verify_customer": handle_verify_customer,
+    "collect_customer_info": handle_collect_customer_info,
+    "get_order_history": handle_get_order_history,
+    "verify_menu_item": handle_verify_menu_item,
+    "create_order": handle_create_order,
+    "end_call": handle_end_call,
+    "get_item_addons": handle_get_item_addons,
+}
@@ -0,0 +1,171 @@
+"""
+Candidate index for matching spoken item names against the cached menu.
+This file maps 3-character windows of menu names to the items containing them,
+so partial-match loops only visit items that could possibly match.
+"""
+
+from rapidfuzz import fuzz, process
+
+# Window length; names shorter than this can't be indexed and are always scanned
+NGRAM = 3
+
+# Minimum WRatio score (0-100) for a typo-tolerant match, and how many to keep
+FUZZY_SCORE_CUTOFF = 70
+FUZZY_LIMIT = 5
+
+# Minimum plain ratio score for a misspelled add-on name to resolve
+ADDON_SCORE_CUTOFF = 80
+
+
+def name_ngrams(name):
+    """Return the set of NGRAM-character windows of a lowercased name."""
+    return {name[i : i + NGRAM] for i in range(len(name) - NGRAM + 1)}
+
+
+class MenuNameIndex:
+    """
+    Trigram posting lists over a fixed list of menu items.
+
+    If one name contains the other, every window of the shorter one is also a
+    window of the longer one, so any substring match shares at least one
+    trigram with the query. The candidates are therefore a superset of the
+    substring matches, returned in menu order.
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        # Lowercased once here so match loops never re-lowercase a menu name
+        self.names_lower = [item.name.lower() for item in self.items]
+        self.categories_lower = [item.category.lower() for item in self.items]
+        self.postings = {}  # trigram -> positions in self.items
+        self.short = []  # positions of names too short to index
+
+        # Lowercased name -> first available item with exactly that name
+        self.available_by_name = {}
+        for item, name_lower in zip(self.items, self.names_lower):
+            if getattr(item, "is_available", 1) == 1:
+                self.available_by_name.setdefault(name_lower, item)
+
+        for position, name_lower in enumerate(self.names_lower):
+            grams = name_ngrams(name_lower)
+            if not grams:
+                self.short.append(position)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(position)
+
+    def candidates(self, query_lower):
+        """
+        Return the items that may contain, or be contained in, the query.
+
+        Args:
+            query_lower: The lowercased item name to match
+
+        Returns:
+            List of (menu item, lowercased name, lowercased category) tuples
+            in menu order
+        """
+        grams = name_ngrams(query_lower)
+        if not grams:
+            return list(zip(self.items, self.names_lower, self.categories_lower))
+
+        positions = set(self.short)
+        for gram in grams:
+            positions.update(self.postings.get(gram, ()))
+        return [
+            (
+                self.items[position],
+                self.names_lower[position],
+                self.categories_lower[position],
+            )
+            for position in sorted(positions)
+        ]
+
+    def matches(self, query_lower, category_lower=None):
+        """
+        Return available items matching a spoken name, best first.
+
+        Names containing, or contained in, the query win. If there are none,
+        the closest names by WRatio are returned instead, which catches
+        transpositions and misspellings.
+
+        Args:
+            query_lower: The lowercased item name to match
+            category_lower: Optional lowercased category to restrict to
+
+        Returns:
+            List of menu items
+        """
+        found = [
+            item
+            for item, name_lower, item_category_lower in self.candidates(query_lower)
+            if getattr(item, "is_available", 1) == 1
+            and (not category_lower or item_category_lower == category_lower)
+            and (name_lower in query_lower or query_lower in name_lower)
+        ]
+        if found:
+            return found
+
+        # Filter before scoring so rapidfuzz only sees eligible names
+        choices = {
+            position: name_lower
+            for position, (item, name_lower, item_category_lower) in enumerate(
+                zip(self.items, self.names_lower, self.categories_lower)
+            )
+            if getattr(item, "is_available", 1) == 1
+            and (not category_lower or item_category_lower == category_lower)
+        }
+        scored = process.extract(
+            query_lower,
+            choices,
+            scorer=fuzz.WRatio,
+            score_cutoff=FUZZY_SCORE_CUTOFF,
+            limit=FUZZY_LIMIT,
+        )
+        return [self.items[position] for _, _, position in scored]
+
+
+class AddOnMatcher:
+    """
+    Resolves spoken add-on names against one category's add-ons.
+
+    An exact name is a dict hit. Otherwise the first add-on whose name
+    contains, or is contained in, the spoken name wins, so "extra bacon"
+    resolves to "Bacon". As a last resort rapidfuzz picks the single closest
+    name by plain ratio above ADDON_SCORE_CUTOFF, and stops scoring a name as
+    soon as it can no longer reach the cutoff.
+    """
+
+    def __init__(self, add_ons):
+        self.add_ons = list(add_ons)
+        self.names_lower = [add_on.name.lower() for add_on in self.add_ons]
+        self.by_name = {}
+        for add_on, name_lower in zip(self.add_ons, self.names_lower):
+            self.by_name.setdefault(name_lower, add_on)
+
+    def match(self, spoken_lower):
+        """
+        Find the add-on for a lowercased spoken name.
+
+        Returns:
+            (add_on, contained) where contained is True when the add-on name
+            was found inside a longer spoken phrase, or (None, False)
+        """
+        add_on = self.by_name.get(spoken_lower)
+        if add_on is not None:
+            return add_on, False
+
+        for add_on, name_lower in zip(self.add_ons, self.names_lower):
+            if name_lower in spoken_lower or spoken_lower in name_lower:
+                return add_on, True
+
+        if self.add_ons:
+            best = process.extractOne(
+                spoken_lower,
+                self.names_lower,
+                scorer=fuzz.ratio,
+                score_cutoff=ADDON_SCORE_CUTOFF,
+            )
+            if best is not None:
+                return self.add_ons[best[2]], False
+
+        return None, False
@@ -1,7 +1,12 @@
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, NOT_GIVEN
 import os
+import atexit
+import hashlib
 import json
 import logging
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
 from ..custom_types import (
     ResponseRequiredRequest,
     ResponseResponse,
@@ -10,9 +15,26 @@ from ..custom_types import (
 from typing import List, Tuple, Optional
 from ..db.database import Database
 import time
-from .prompts import welcome_msg, agent_prompt, system_prompt, reminder_message
-from .tools import get_tool_definitions
+from .prompts import (
+    welcome_msg,
+    reminder_message,
+    AGENT_PROMPT_STATIC,
+    PROMPT_HASHES,
+    render_system_prompt,
+    static_prompt_token_count,
+)
 from .handler import verify_menu_item_function, handle_function_call
+from .fast_path import confirmation_fast_path, StateMutationTracker
+from .response_cache import response_cache
+from .state_machine import (
+    State,
+    current_state,
+    tools_for,
+    STATE_TOOLS,
+    TOOLS_BY_STATE,
+)
+from .tools import constrain_add_ons
+from .menu_index import MenuNameIndex
 
 # Ensure logs directory exists
 logs_dir = "logs"
@@ -20,62 +42,148 @@ if not os.path.exists(logs_dir):
     print(f"Logs directory {logs_dir} does not exist. Creating it.")
     os.makedirs(logs_dir)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(os.path.join(logs_dir, "db_operations.log")),
-        logging.StreamHandler(),
-    ],
-)
+# Configure logging. Callers only enqueue records; a single background listener
+# thread does the file and console writes, so logging never blocks on disk I/O.
+log_queue = queue.Queue(-1)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
 logger = logging.getLogger("db_operations")
 
+root_formatter = logging.Formatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+db_handler = logging.FileHandler(os.path.join(logs_dir, "db_operations.log"))
+stream_handler = logging.StreamHandler()
+db_handler.setFormatter(root_formatter)
+stream_handler.setFormatter(root_formatter)
+
 # Create separate loggers for different components
 conversation_logger = logging.getLogger("conversation")
 conversation_logger.setLevel(logging.INFO)
 conversation_handler = logging.FileHandler(os.path.join(logs_dir, "conversation.log"))
-conversation_logger.addHandler(conversation_handler)
 
 tool_logger = logging.getLogger("tool_calls")
 tool_logger.setLevel(logging.INFO)
 tool_handler = logging.FileHandler(os.path.join(logs_dir, "tool_calls.log"))
-tool_logger.addHandler(tool_handler)
 
 response_logger = logging.getLogger("responses")
 response_logger.setLevel(logging.INFO)
 response_handler = logging.FileHandler(os.path.join(logs_dir, "responses.log"))
-response_logger.addHandler(response_handler)
 
-# Format for specialized logs
+# Format for specialized logs; their records reach the queue through the root
+# logger, so each file handler keeps only its own logger's records
 log_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-conversation_handler.setFormatter(log_formatter)
-tool_handler.setFormatter(log_formatter)
-response_handler.setFormatter(log_formatter)
+for handler, name in (
+    (conversation_handler, "conversation"),
+    (tool_handler, "tool_calls"),
+    (response_handler, "responses"),
+):
+    handler.setFormatter(log_formatter)
+    handler.addFilter(logging.Filter(name))
+
+log_listener = QueueListener(
+    log_queue,
+    db_handler,
+    stream_handler,
+    conversation_handler,
+    tool_handler,
+    response_handler,
+)
+log_listener.start()
+atexit.register(log_listener.stop)
 
+# Minimum expected share of cached prompt tokens once a conversation is underway
+CACHE_HIT_RATE_ALERT = 0.7
 
-class OrderAgent:
-    def __init__(self):
-        self.client = AsyncOpenAI(
+# Routes every call that shares the static system prompt to the same prefix cache
+PROMPT_CACHE_KEY = PROMPT_HASHES["static"][:32]
+
+# Cacheable turns are sampled greedily so a stored reply is the one the model
+# would give again (see response_cache)
+RESPONSE_CACHE_TEMPERATURE = 0
+
+# The greeting never changes, so build the first response event once per process
+BEGIN_RESPONSE = ResponseResponse(
+    response_id=0,
+    content=welcome_msg,
+    content_complete=True,
+    end_call=False,
+)
+
+# Add-on types in the order they are offered (size, then sauce, then toppings),
+# with their menu labels precomputed
+ADDON_TYPE_ORDER = (
+    ("size", "- Size options: "),
+    ("sauce", "- Sauce options: "),
+    ("topping", "- Topping options: "),
+    ("other", "- Other options: "),
+)
+NO_EXTRA_CHARGE = "no extra charge"
+
+# Strips everything but ASCII digits from phone numbers in a single pass
+NON_DIGITS_RE = re.compile(r"[^0-9]")
+
+# One OpenAI client per process, so every call reuses the same warm connection pool
+_openai_client = None
+
+
+def get_openai_client():
+    """Return the process-wide AsyncOpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(
             api_key=os.environ["OPENAI_API_KEY"],
         )
+    return _openai_client
+
+
+async def warmup():
+    """
+    Open the OpenAI connection before the first call arrives.
+
+    The first request pays for DNS, TLS and connection setup; a one-token
+    completion at startup moves that cost off the first customer turn.
+    The tokenizer and prompt texts are already loaded by importing prompts.
+    """
+    start = time.time()
+    await get_openai_client().chat.completions.create(
+        model=os.environ["OPENAI_MODEL"],
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1,
+    )
+    logger.info(f"OpenAI client warmed up in {time.time() - start:.3f}s")
+
+
+class OrderAgent:
+    def __init__(self):
+        self.client = get_openai_client()
         self.db = Database()
         self.from_number = None  # Store the caller's phone number from the request
         self.verified_customer = None  # Store verified customer information
+        self.customer_identified = False  # Set once the caller's phone has been checked
         self.current_order = None  # Store the current order information
+        self.pending_confirmation = None  # Confirmation question awaiting an answer
+        self.system_content = None  # Rendered system message, built on first use
+        self.system_tag = None  # Hash of system_content for response cache keys
+        self.state_tracker = StateMutationTracker()  # Detects confirmation loops
+        self.tool_cache = {}  # Replies to read-only tool calls, keyed by call hash
         self.conversation_id = str(int(time.time()))  # Create unique conversation ID
 
         # Cache menu and restaurant information
         try:
             logger.info("Retrieving and caching menu information from database")
-            self.menu_items = self.db.get_menu()
-            logger.info(f"Cached {len(self.menu_items)} menu items")
+            menu_bundle = self.db.get_menu_bundle()
+
+            self.menu_items = menu_bundle["menu_items"]
+            self.items_by_category = menu_bundle["items"]
+            logger.info(
+                f"Cached {len(self.menu_items)} menu items in {len(self.items_by_category)} categories"
+            )
 
-            self.add_ons = self.db.get_add_ons()
+            self.add_ons = menu_bundle["add_ons"]
             logger.info(f"Cached {len(self.add_ons)} add-ons")
 
             # Get restaurant information
-            self.restaurant = self.db.get_restaurant()
+            self.restaurant = menu_bundle["restaurant"]
             logger.info(
                 f"Cached restaurant information: {self.restaurant.name if self.restaurant else 'None'}"
             )
@@ -86,27 +194,38 @@ class OrderAgent:
             logger.error(f"Traceback: {traceback.format_exc()}")
             # Use empty lists to avoid breaking initialization
             self.menu_items = []
+            self.items_by_category = {}
             self.add_ons = []
             self.restaurant = None
 
+        # Trigram index that narrows partial name matches to likely candidates
+        self.menu_index = MenuNameIndex(self.menu_items)
+
+        # Constrain create_order add-ons to the names on this menu
+        allowed_addons = sorted({addon.name for addon in self.add_ons})
+        self.tools_by_state = {
+            state: constrain_add_ons(tools, allowed_addons)
+            for state, tools in TOOLS_BY_STATE.items()
+        }
+
     def set_from_number(self, from_number):
         """Set the caller's phone number from the call request"""
         self.from_number = from_number
         logger.info(f"Set from_number: {self.from_number}")
 
+    def get_restaurant(self):
+        """Return the restaurant cached with the menu, fetching it if that load failed"""
+        if self.restaurant is None:
+            self.restaurant = self.db.get_restaurant()
+        return self.restaurant
+
     def draft_begin_message(self):
         # Log the initial agent message
         conversation_logger.info(
             f"CONV_ID:{self.conversation_id} ROLE:agent MESSAGE:{welcome_msg}"
         )
 
-        response = ResponseResponse(
-            response_id=0,
-            content=welcome_msg,
-            content_complete=True,
-            end_call=False,
-        )
-        return response
+        return BEGIN_RESPONSE
 
     def convert_transcript_to_openai_messages(self, transcript: List[Utterance]):
         # Log the current conversation transcript
@@ -131,34 +250,73 @@ class OrderAgent:
             else self.prepare_prompt_original(request)
         )
 
-        # Inform the LLM about the from_number if available
+        # Inform the LLM about the from_number if available. It goes in its own
+        # message so the first system message stays identical across calls and
+        # is served from the provider's prompt cache.
         if (
             self.from_number
             and len(current_prompt) > 0
             and current_prompt[0]["role"] == "system"
         ):
-            current_prompt[0][
-                "content"
-            ] += f"\n\nIMPORTANT: The caller's phone number is {self.from_number}. After asking for their name, use this number to check if they are an existing customer. Do not ask for their phone number unless explicitly instructed to do so."
+            current_prompt.insert(
+                1,
+                {
+                    "role": "system",
+                    "content": f"IMPORTANT: The caller's phone number is {self.from_number}. After asking for their name, use this number to check if they are an existing customer. Do not ask for their phone number unless explicitly instructed to do so.",
+                },
+            )
 
         return current_prompt
 
     def prepare_prompt_original(self, request: ResponseRequiredRequest):
+        # The menu is cached for the whole call, so the system message is built once
+        if self.system_content is None:
+            self.system_content = self._build_system_content()
+            # The static prefix is already hashed; only this call's tail is new
+            self.system_tag = hashlib.sha256(
+                (
+                    PROMPT_HASHES["static"]
+                    + self.system_content[len(AGENT_PROMPT_STATIC) :]
+                ).encode("utf-8")
+            ).hexdigest()
+            response_logger.info(
+                f"CONV_ID:{self.conversation_id} SYSTEM_PROMPT:{self.system_content}"
+            )
+
+        prompt = [
+            {
+                "role": "system",
+                "content": self.system_content,
+            }
+        ]
+
+        transcript_messages = self.convert_transcript_to_openai_messages(
+            request.transcript
+        )
+        for message in transcript_messages:
+            prompt.append(message)
+
+        if request.interaction_type == "reminder_required":
+            prompt.append(
+                {
+                    "role": "user",
+                    "content": reminder_message,
+                }
+            )
+        return prompt
+
+    def _build_system_content(self):
+        """Render the system message from the static prompts and the cached menu."""
         # Format menu information for the prompt
         menu_info = "## Our Delicious Menu\n"
 
-        # Filter available items only
-        available_items = [
-            item for item in self.menu_items if getattr(item, "is_available", 1) == 1
-        ]
-        logger.info(f"Using {len(available_items)} available menu items from cache")
+        # Available items, already grouped by category when the menu was loaded
+        categories = self.items_by_category
+        logger.info(f"Using {len(self.menu_items)} available menu items from cache")
 
-        # Group items by category
-        categories = {}
-        for item in available_items:
-            if item.category not in categories:
-                categories[item.category] = []
-            categories[item.category].append(item)
+        # Bake the available categories into the prompt
+        category_list = ", ".join(f"{category.title()}s" for category in categories)
+        menu_info += f"We currently serve: {category_list}.\n"
 
         # Add items to menu info with more engaging descriptions
         for category, items in categories.items():
@@ -188,27 +346,21 @@ class OrderAgent:
 
                 grouped_addons[addon.category][addon_type].append(addon)
 
-            # Add grouped add-ons to menu info
+            # Add grouped add-ons to menu info, one joined line per add-on type
+            lines = []
             for category, types in grouped_addons.items():
-                menu_info += f"\nFor our {category}s, we offer:\n"
-
-                # Order types: size first, then sauce, then toppings, then others
-                type_order = ["size", "sauce", "topping", "other"]
-
-                for addon_type in type_order:
-                    if addon_type in types and types[addon_type]:
-                        menu_info += f"- {addon_type.title()} options: "
-                        type_addons = types[addon_type]
-                        for i, addon in enumerate(type_addons):
-                            price_text = (
-                                f"${addon.price:.2f}"
-                                if addon.price != 0
-                                else "no extra charge"
-                            )
-                            if i > 0:
-                                menu_info += ", "
-                            menu_info += f"{addon.name} ({price_text})"
-                        menu_info += "\n"
+                lines.append(f"\nFor our {category}s, we offer:")
+                for addon_type, label in ADDON_TYPE_ORDER:
+                    type_addons = types.get(addon_type)
+                    if type_addons:
+                        options = ", ".join(
+                            f"{addon.name} (${addon.price:.2f})"
+                            if addon.price != 0
+                            else f"{addon.name} ({NO_EXTRA_CHARGE})"
+                            for addon in type_addons
+                        )
+                        lines.append(label + options)
+            menu_info += "\n".join(lines) + "\n"
 
         menu_info += "\nEverything is prepared fresh to order for pickup at our restaurant. What would you like to try today?"
 
@@ -218,30 +370,12 @@ class OrderAgent:
         else:
             menu_info += "\n\nPlease note: We are a PICKUP ONLY restaurant. Once your order is confirmed, we'll provide you with our pickup address and an estimated preparation time."
 
-        prompt = [
-            {
-                "role": "system",
-                "content": system_prompt + menu_info + "\n## Role\n" + agent_prompt,
-            }
-        ]
-
-        transcript_messages = self.convert_transcript_to_openai_messages(
-            request.transcript
-        )
-        for message in transcript_messages:
-            prompt.append(message)
-
-        if request.interaction_type == "reminder_required":
-            prompt.append(
-                {
-                    "role": "user",
-                    "content": reminder_message,
-                }
-            )
-        return prompt
+        restaurant_name = self.restaurant.name if self.restaurant else "our restaurant"
+        return render_system_prompt(restaurant_name, menu_info)
 
     def prepare_functions(self):
-        return get_tool_definitions()
+        # Only offer the tools that make sense at this stage of the conversation
+        return tools_for(current_state(self), self.tools_by_state)
 
     def _validate_phone_number(self, phone) -> Tuple[bool, Optional[str], str]:
         """
@@ -252,8 +386,11 @@ class OrderAgent:
             # Convert to string to handle if it's already an integer
             phone_str = str(phone)
 
-            # Remove any non-digit characters for validation
-            digits_only = "".join(c for c in phone_str if c.isdigit())
+            # Remove any non-digit characters for validation, unless it's already clean
+            if len(phone_str) == 10 and phone_str.isascii() and phone_str.isdigit():
+                digits_only = phone_str
+            else:
+                digits_only = NON_DIGITS_RE.sub("", phone_str)
 
             # Check if it's exactly 10 digits
             if len(digits_only) != 10:
@@ -284,23 +421,100 @@ class OrderAgent:
             end_call=end_call,
         )
 
+    def _response_cache_key(self, request, pending):
+        """
+        Return the response cache key for this turn, or None if it can't be replayed.
+
+        Only turns before any items are discussed are replayable: while the
+        customer is not identified, or when answering a scripted confirmation.
+        Later replies depend on the order built up in the conversation.
+        """
+        if request.interaction_type != "response_required" or not self.system_tag:
+            return None
+        if not request.transcript or request.transcript[-1].role != "user":
+            return None
+
+        state = current_state(self)
+        if state is not State.GREET and not pending:
+            return None
+
+        previous_reply = ""
+        if len(request.transcript) > 1 and request.transcript[-2].role == "agent":
+            previous_reply = request.transcript[-2].content
+
+        state_tag = f"{self.system_tag}|{state.value}|{pending or ''}"
+        return response_cache.make_key(
+            request.transcript[-1].content, previous_reply, state_tag
+        )
+
     async def draft_response(self, request: ResponseRequiredRequest):
+        # The fast path consumes the pending question; the response cache keys on it
+        pending = self.pending_confirmation
+
+        # Plain "yes" answers to a scripted confirmation don't need the LLM
+        fast_reply = confirmation_fast_path(self, request)
+        if fast_reply:
+            conversation_logger.info(
+                f"CONV_ID:{self.conversation_id} ROLE:agent MESSAGE:{fast_reply}"
+            )
+            yield self.create_response(request.response_id, fast_reply)
+            return
+
         prompt = self.prepare_prompt(request)
+
+        # Force forward progress if the customer keeps confirming without a tool call
+        tool_choice = "auto"
+        if request.interaction_type == "response_required":
+            self.state_tracker.start_turn()
+            loop_breaker = self.state_tracker.loop_breaker(request.transcript)
+            if loop_breaker:
+                breaker_message, forced_tool = loop_breaker
+                prompt.append({"role": "system", "content": breaker_message})
+                if (
+                    forced_tool
+                    and forced_tool["function"]["name"]
+                    in STATE_TOOLS[current_state(self)]
+                ):
+                    tool_choice = forced_tool
+
         func_call = {}
         func_arguments = ""
         accumulated_content = ""  # Variable to accumulate content chunks
 
-        # Log the prepared prompt
-        prompt_str = json.dumps(prompt, indent=2)
+        # Log the prepared prompt. The static system message is logged once per
+        # call when it is built, so only the messages after it are encoded here.
+        prompt_str = json.dumps(prompt[1:], indent=2)
         response_logger.info(f"CONV_ID:{self.conversation_id} PROMPT:{prompt_str}")
 
+        # Replay the reply to a short turn in the same conversation state
+        # without calling the LLM; forced-progress turns are never replayed
+        cache_key = None
+        if tool_choice == "auto":
+            cache_key = self._response_cache_key(request, pending)
+        if cache_key is not None:
+            cached_reply = response_cache.get(cache_key)
+            if cached_reply:
+                conversation_logger.info(
+                    f"CONV_ID:{self.conversation_id} ROLE:agent MESSAGE:{cached_reply}"
+                )
+                yield self.create_response(request.response_id, cached_reply)
+                return
+
         # Continue with normal OpenAI flow
         try:
             stream = await self.client.chat.completions.create(
                 model=os.environ["OPENAI_MODEL"],
                 messages=prompt,
                 stream=True,
+                stream_options={"include_usage": True},
                 tools=self.prepare_functions(),
+                tool_choice=tool_choice,
+                # Replayable turns are sampled greedily so the stored reply is
+                # the one the model would give again; other turns are unchanged
+                temperature=(
+                    RESPONSE_CACHE_TEMPERATURE if cache_key is not None else NOT_GIVEN
+                ),
+                extra_body={"prompt_cache_key": PROMPT_CACHE_KEY},
             )
 
             # Log the request to OpenAI
@@ -309,6 +523,9 @@ class OrderAgent:
             )
 
             async for chunk in stream:
+                # The usage summary arrives on a final chunk with no choices
+                if chunk.usage:
+                    self._log_cache_usage(request, chunk.usage)
                 if len(chunk.choices) == 0:
                     continue
                 if chunk.choices[0].delta.tool_calls:
@@ -316,6 +533,7 @@ class OrderAgent:
                     if tool_calls.id:
                         if func_call:
                             break
+                        self.state_tracker.record_tool_call()
                         func_call = {
                             "id": tool_calls.id,
                             "func_name": tool_calls.function.name or "",
@@ -347,12 +565,20 @@ class OrderAgent:
                     f"CONV_ID:{self.conversation_id} COMPLETE_CONTENT:{accumulated_content}"
                 )
 
+            # cache_key is only set on replayable turns sampled at temperature 0
+            if accumulated_content:
+                response_cache.put(cache_key, accumulated_content, func_call)
+
             if func_call:
                 # Use the handle_function_call from handler.py
                 async for response in handle_function_call(
                     self, request, func_call, func_arguments
                 ):
                     yield response
+            else:
+                # Mark the reply complete so Retell speaks the final sentence
+                # right away instead of waiting for more text
+                yield self.create_response(request.response_id, "")
         except Exception as e:
             # Log any exceptions during the API call
             error_msg = f"Error during OpenAI API call: {str(e)}"
@@ -369,6 +595,27 @@ class OrderAgent:
                 end_call=False,
             )
 
+    def _log_cache_usage(self, request: ResponseRequiredRequest, usage):
+        """Log how much of the prompt was served from the provider's prompt cache."""
+        prompt_tokens = usage.prompt_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        prompt_hash = PROMPT_HASHES["static"][:12]
+
+        response_logger.info(
+            f"CONV_ID:{self.conversation_id} CACHE_USAGE:prompt_hash={prompt_hash} "
+            f"prompt_tokens={prompt_tokens} cached_tokens={cached_tokens} "
+            f"static_tokens={static_prompt_token_count}"
+        )
+
+        # After the first turn the static prefix should be served from cache
+        if len(request.transcript) > 1 and prompt_tokens:
+            hit_rate = cached_tokens / prompt_tokens
+            if hit_rate < CACHE_HIT_RATE_ALERT:
+                logger.warning(
+                    f"Low prompt cache hit rate {hit_rate:.0%} for prompt_hash={prompt_hash}"
+                )
+
     def _calculate_total_amount(self, order_items):
         """Calculate the total amount for an order based on the menu items and their add-ons."""
         # This is now handled directly in the create_order function
@@ -382,24 +629,32 @@ class OrderAgent:
             return sum(item["total_price"] for item in order_items)
 
         # Legacy calculation for old format
-        print(f"Calculating total amount for order: {order_items}")
+        logger.debug("Calculating total amount for order: %s", order_items)
         total = 0
+        # Fetch every menu item and all of their add-ons up front in two queries;
+        # only names without an exact match fall back to the fuzzy matcher
+        menu_cache = self.db.find_similar_menu_items_bulk(
+            [item["item_name"] for item in order_items]
+        )
+
+        addons_cache = {
+            category: {a.name: a for a in add_ons}
+            for category, add_ons in self.db.get_add_ons_by_category(
+                {m.category for m in menu_cache.values() if m}
+            ).items()
+        }
+
+        # Price each item once as (base + add-ons) x quantity; phone orders are
+        # a handful of lines, so plain sum() beats pulling in NumPy
         for item in order_items:
-            menu_item = self.db.find_similar_menu_item(item["item_name"])
+            menu_item = menu_cache[item["item_name"].lower()]
             if menu_item and getattr(menu_item, "is_available", 1) == 1:
-                item_total = menu_item.base_price * item["quantity"]
-                total += item_total
-
-                for addon_name in item.get("add_ons", []):
-                    addon = next(
-                        (
-                            a
-                            for a in self.db.get_add_ons(menu_item.category)
-                            if a.name == addon_name
-                        ),
-                        None,
-                    )
-                    if addon:
-                        total += addon.price * item["quantity"]
+                addons_by_name = addons_cache[menu_item.category]
+                unit_price = menu_item.base_price + sum(
+                    addons_by_name[addon_name].price
+                    for addon_name in item.get("add_ons", [])
+                    if addon_name in addons_by_name
+                )
+                total += unit_price * item["quantity"]
 
         return total
@@ -0,0 +1,84 @@
+"""
+Response cache for the OrderAgent.
+This file contains an LRU cache of assistant replies for turns that ended without a tool call.
+"""
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+
+logger = logging.getLogger("db_operations")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.,!?]+$")
+
+# Only short turns such as "yes" or "show me the menu" recur often enough to be
+# worth caching; longer utterances are answered by the LLM as usual
+REPLAYABLE_MAX_WORDS = 4
+
+
+def normalize(text):
+    """Normalize a user utterance so trivial ASR variations share a cache entry."""
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class ResponseCache:
+    """
+    LRU cache of assistant replies.
+
+    Entries are keyed on the normalized user utterance, the agent message it
+    answers, and a compact tag for the conversation state (the system prompt
+    version, the state machine state and any pending confirmation). The caller
+    decides which states are replayable and passes no tag for the others.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, utterance, previous_reply, state_tag):
+        """
+        Return the cache key for a user turn, or None if it can't be replayed.
+
+        Args:
+            utterance: What the user just said
+            previous_reply: The agent message the user is answering, or ""
+            state_tag: Compact description of the conversation state
+        """
+        normalized = normalize(utterance)
+        if not normalized or len(normalized.split(" ")) > REPLAYABLE_MAX_WORDS:
+            return None
+
+        return hashlib.sha256(
+            f"{normalized}|{normalize(previous_reply)}|{state_tag}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key):
+        if key is None or key not in self.entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        logger.info(
+            f"Response cache hit ({self.hits} hits / {self.hits + self.misses} lookups)"
+        )
+        return self.entries[key]
+
+    def put(self, key, content, func_call=None):
+        """Store a reply; replies that came with a tool call have side effects and are skipped."""
+        if key is None or func_call:
+            return
+
+        self.entries[key] = content
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+# Shared by every call handled by this process
+response_cache = ResponseCache()
@@ -0,0 +1,69 @@
+"""
+Conversation state machine for the OrderAgent.
+This file maps each stage of the ordering flow to the tools the LLM may call in it.
+"""
+
+from enum import Enum
+
+from .tools import get_tool_definitions
+
+
+class State(Enum):
+    GREET = "greet"  # Customer not identified yet
+    ORDERING = "ordering"  # Customer identified, building the order
+    PLACED = "placed"  # Order created, only updates and wrap-up remain
+
+
+# Tools the LLM may call in each state. Menu lookups are read-only and callers
+# often ask about the menu before giving their details, so only placing an
+# order waits for the customer to be identified.
+STATE_TOOLS = {
+    State.GREET: (
+        "verify_customer",
+        "collect_customer_info",
+        "get_order_history",
+        "verify_menu_item",
+        "get_item_addons",
+        "end_call",
+    ),
+    State.ORDERING: (
+        "collect_customer_info",
+        "get_order_history",
+        "verify_menu_item",
+        "get_item_addons",
+        "create_order",
+        "end_call",
+    ),
+    # Placed orders can still be changed, so the menu lookups stay available
+    State.PLACED: (
+        "collect_customer_info",
+        "get_order_history",
+        "verify_menu_item",
+        "get_item_addons",
+        "create_order",
+        "end_call",
+    ),
+}
+
+
+# Per-state tool definitions, filtered once at import instead of on every turn
+TOOLS_BY_STATE = {
+    state: tuple(
+        tool for tool in get_tool_definitions() if tool["function"]["name"] in names
+    )
+    for state, names in STATE_TOOLS.items()
+}
+
+
+def current_state(agent):
+    """Derive the conversation state from what the agent has recorded so far."""
+    if agent.current_order is not None:
+        return State.PLACED
+    if agent.customer_identified:
+        return State.ORDERING
+    return State.GREET
+
+
+def tools_for(state, tools_by_state=None):
+    """Return the tool definitions available in the given state."""
+    return (tools_by_state or TOOLS_BY_STATE)[state]
@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, field_validator
 from typing import Optional, Dict, Any, List
 from sqlalchemy.orm import Session
-from app.db.user_model import UserManager, User
-from app.db.database import Database
+from app.db.user_model import User
+from app.deps import db, user_manager
 import os
-from fastapi import Header
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from collections import OrderedDict
+from fastapi import Header, Query
 from dotenv import load_dotenv
+import jwt
+import orjson
 
 if os.path.exists("../.env"):
     load_dotenv(dotenv_path="../.env")
@@ -17,17 +26,27 @@ elif os.path.exists(".env"):
 else:
     raise FileNotFoundError("Environment file not found in either ../.env or .env")
 
+# Per-request auth logging is debug level so production (INFO) skips formatting it
+log = logging.getLogger("auth")
+
 # Initialize router
 router = APIRouter(
     tags=["users"],
     responses={404: {"description": "Not found"}},
 )
 
-# Initialize database connection
-db = Database()
+# Serializes use of the shared session across worker threads (see run_db)
+_db_lock = asyncio.Lock()
+
 
-# Create UserManager
-user_manager = UserManager(db.session, os.environ["JWT_SECRET_KEY"])
+# Rows fetched per batch when streaming the admin user list
+USER_STREAM_BATCH_SIZE = 1000
+
+# Fields a user may not change through /users/me; passwords go through
+# /users/change-password and account status through the admin endpoints
+USER_UPDATE_BLOCKLIST = frozenset(
+    {"id", "password", "password_hash", "salt", "is_admin", "is_active"}
+)
 
 
 # Pydantic models for request and response
@@ -56,7 +75,10 @@ class UserLogin(BaseModel):
     password: str
 
 
+# Routes return User rows directly and FastAPI converts them via response_model
 class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     username: str
     email: str
@@ -65,6 +87,8 @@ class UserResponse(BaseModel):
 
 # Full user response including all fields
 class FullUserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     username: str
     email: str
@@ -72,6 +96,13 @@ class FullUserResponse(BaseModel):
     is_active: bool
     created_at: str
 
+    @field_validator("created_at", mode="before")
+    @classmethod
+    def format_created_at(cls, value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value or ""
+
 
 class TokenResponse(BaseModel):
     access_token: str
@@ -81,58 +112,177 @@ class TokenResponse(BaseModel):
 
 # Dependency to get the current user
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
+BEARER_PREFIX = "Bearer "
+
+# Authenticated users keyed by their bearer token, so bursts of requests with the
+# same token skip JWT verification and the user lookup. Keying on the token
+# itself means a cached user is only ever returned to the holder of that token.
+TOKEN_CACHE_TTL = 60  # seconds
+TOKEN_CACHE_SIZE = 10_000
+_token_cache = OrderedDict()  # token -> (user, expires_at)
+# Lookups run on the event loop but invalidation runs inside run_db worker
+# threads, so every access to _token_cache holds this lock
+_token_cache_lock = threading.Lock()
+
+
+def _cache_token_user(token, user):
+    """Cache the user for a verified token, never past the token's own expiry."""
+    expires_at = time.time() + TOKEN_CACHE_TTL
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+        expires_at = min(expires_at, claims.get("exp", expires_at))
+    except jwt.InvalidTokenError:
+        return
+    with _token_cache_lock:
+        _token_cache[token] = (user, expires_at)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+
+def _get_cached_token_user(token):
+    """Return the cached user for a token, or None if missing or expired."""
+    with _token_cache_lock:
+        entry = _token_cache.get(token)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            _token_cache.pop(token, None)
+            return None
+        _token_cache.move_to_end(token)
+        return user
 
 
-async def get_current_user(authorization: str = Header(None)):
+# Admin user listings, shared by all admins since they don't depend on the caller.
+# Cleared whenever a user is created or changed. /users/me is never cached here.
+ADMIN_CACHE_TTL = 30  # seconds
+ADMIN_CACHE_SIZE = 256
+_admin_cache = {}  # key -> (response, expires_at)
+# Bumped on every clear, so a fetch that overlapped a change isn't cached
+_admin_cache_generation = 0
+# Reads and puts run on the event loop but clears run in run_db worker threads
+_admin_cache_lock = threading.Lock()
+
+
+def _get_admin_cached(key):
     """
-    Dependency to get the current user from the authorization token.
+    Return a cached admin response, or None if missing or expired.
+
+    Returns:
+        A (response, generation) tuple; pass generation to _put_admin_cached
+    """
+    with _admin_cache_lock:
+        entry = _admin_cache.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None, _admin_cache_generation
+        return entry[0], _admin_cache_generation
+
+
+def _put_admin_cached(key, response, generation):
+    """Cache a response fetched at generation, unless the cache was cleared since."""
+    with _admin_cache_lock:
+        if generation != _admin_cache_generation:
+            return
+        # Keys come from request parameters, so bound the cache by starting over
+        if len(_admin_cache) >= ADMIN_CACHE_SIZE:
+            _admin_cache.clear()
+        _admin_cache[key] = (response, time.time() + ADMIN_CACHE_TTL)
+
+
+def clear_admin_cache():
+    """Drop cached admin responses after any change to the users table."""
+    global _admin_cache_generation
+    with _admin_cache_lock:
+        _admin_cache.clear()
+        _admin_cache_generation += 1
+
+
+def invalidate_user_tokens(user_id):
+    """Drop cached tokens for a user whose account or credentials changed."""
+    clear_admin_cache()
+    with _token_cache_lock:
+        for token, (user, _) in list(_token_cache.items()):
+            if str(user.id) == str(user_id):
+                _token_cache.pop(token, None)
+
+
+async def get_bearer_token(authorization: str = Header(None)):
+    """
+    Dependency to extract the token from the Authorization header.
     """
-    print(f"Authorization header received: {authorization}")
     if not authorization:
-        print("No authorization header provided")
+        log.debug("No authorization header provided")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Extract token from header
-    try:
-        if authorization.startswith("Bearer "):
-            token = authorization.replace("Bearer ", "")
-        else:
-            token = authorization
+    # Strip only a leading scheme; a bare token is accepted as is
+    token = authorization.removeprefix(BEARER_PREFIX)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Extracted token (first 10 chars): %s...", token[:10])
+    return token
+
 
-        print(f"Extracted token (first 10 chars): {token[:10]}...")
+async def run_db(func, *args, **kwargs):
+    """
+    Run blocking database work in a worker thread so it doesn't stall the event loop.
+
+    The module shares a single SQLAlchemy session, which is not thread-safe, so
+    calls are serialized with a lock; the event loop stays free for websocket
+    traffic while they run.
+    """
+    async with _db_lock:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def _load_user(user_id):
+    """Load a user and detach it, so it can be read outside the worker thread."""
+    user = user_manager.get_user_by_id(user_id)
+    if user is not None:
+        db.session.expunge(user)
+    return user
+
+
+async def get_current_user(token: str = Depends(get_bearer_token)):
+    """
+    Dependency to get the current user from the authorization token.
+    """
+    try:
+        user = _get_cached_token_user(token)
+        if user is not None:
+            return user
 
         # Verify token
         user_id = user_manager.verify_token(token)
         if not user_id:
-            print("Token verification failed - no user_id returned")
+            log.debug("Token verification failed - no user_id returned")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        print(f"Token verified successfully. User ID: {user_id}")
+        log.debug("Token verified successfully. User ID: %s", user_id)
 
         # Get user from database
-        user = user_manager.get_user_by_id(user_id)
+        user = await run_db(_load_user, user_id)
         if not user:
-            print(f"User with ID {user_id} not found in database")
+            log.info("User with ID %s not found in database", user_id)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        print(f"User authenticated: {user.username} (ID: {user.id})")
+        log.debug("User authenticated: %s (ID: %s)", user.username, user.id)
+        _cache_token_user(token, user)
         return user
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error during authentication: {str(e)}")
+        log.error("Error during authentication: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Authentication error: {str(e)}",
@@ -150,63 +300,56 @@ def get_admin_user(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+# Route bodies below run inside run_db and convert users to response models
+# there, so no ORM attribute is loaded from the event loop thread.
+
+
 # User registration endpoint
 @router.post("/users/register", response_model=UserResponse)
 async def register(user_data: UserCreate):
-    try:
-        # Check if the database and user_manager are properly initialized
-        if not db or not user_manager:
+    def _register():
+        try:
+            # Check if the database and user_manager are properly initialized
+            if not db or not user_manager:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Database connection not initialized",
+                )
+
+            with db.transaction():
+                new_user = user_manager.register_user(
+                    username=user_data.username,
+                    email=user_data.email,
+                    password=user_data.password,
+                )
+            clear_admin_cache()
+
+            return UserResponse.model_validate(new_user)
+        except ValueError as e:
+            # For expected validation errors (like duplicate users)
+            log.info("Validation error in register: %s", e)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except Exception as e:
+            # For unexpected errors
+            log.error("Error registering user: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Database connection not initialized",
+                detail=f"Error registering user: {str(e)}",
             )
 
-        # Explicitly begin a new transaction
-        db.begin_transaction()
-
-        new_user = user_manager.register_user(
-            username=user_data.username,
-            email=user_data.email,
-            password=user_data.password,
-        )
-
-        # Ensure the transaction is committed
-        if not db.commit():
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to commit the transaction",
-            )
-
-        return UserResponse(
-            id=new_user.id,
-            username=new_user.username,
-            email=new_user.email,
-            is_admin=new_user.is_admin,
-        )
-    except ValueError as e:
-        # For expected validation errors (like duplicate users)
-        print(f"Validation error in register: {str(e)}")
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    except Exception as e:
-        # For unexpected errors
-        print(f"Error registering user: {str(e)}")
-        # Ensure transaction is rolled back in the database connection
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error registering user: {str(e)}",
-        )
+    return await run_db(_register)
 
 
 # User login endpoint with direct JSON body
 @router.post("/users/login", response_model=TokenResponse)
 async def login(user_data: UserLogin):
     try:
-        print(f"Login attempt for email: {user_data.email}")
-        user = user_manager.authenticate_user(user_data.email, user_data.password)
+        log.debug("Login attempt for email: %s", user_data.email)
+        user = await run_db(
+            _load_authenticated_user, user_data.email, user_data.password
+        )
         if not user:
-            print(f"Authentication failed for email: {user_data.email}")
+            log.info("Authentication failed for email: %s", user_data.email)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
@@ -215,41 +358,48 @@ async def login(user_data: UserLogin):
 
         # Generate token
         token = user_manager.generate_token(user.id)
-        print(
-            f"Token generated for user: {user.username} (ID: {user.id}), token starts with: {token[:10]}..."
-        )
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(
+                "Token generated for user: %s (ID: %s), token starts with: %s...",
+                user.username,
+                user.id,
+                token[:10],
+            )
 
         # Verify the token works (debug only)
         verified_id = user_manager.verify_token(token)
         if verified_id != user.id:
-            print(f"WARNING: Token verification failed immediately after generation!")
+            log.warning("Token verification failed immediately after generation!")
 
         response = TokenResponse(
             access_token=token,
             token_type="bearer",
-            user=UserResponse(
-                id=user.id,
-                username=user.username,
-                email=user.email,
-                is_admin=user.is_admin,
-            ),
+            user=user,
         )
-        print(f"Login successful for user: {user.username}")
+        log.debug("Login successful for user: %s", user.username)
         return response
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error during login: {str(e)}")
+        log.error("Error during login: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Login error: {str(e)}",
         )
 
 
+def _load_authenticated_user(email, password):
+    """Authenticate a user and return it as a UserResponse, or None."""
+    user = user_manager.authenticate_user(email, password)
+    return UserResponse.model_validate(user) if user else None
+
+
 # Form-based login for compatibility
 @router.post("/users/token", include_in_schema=False)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = user_manager.authenticate_user(form_data.username, form_data.password)
+    user = await run_db(
+        _load_authenticated_user, form_data.username, form_data.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -263,12 +413,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 # Get current user info
 @router.get("/users/me", response_model=UserResponse)
 async def get_user_info(current_user: User = Depends(get_current_user)):
-    return UserResponse(
-        id=current_user.id,
-        username=current_user.username,
-        email=current_user.email,
-        is_admin=current_user.is_admin,
-    )
+    return current_user
 
 
 # Update current user's info
@@ -277,33 +422,29 @@ async def update_user_info(
     user_update: dict, current_user: User = Depends(get_current_user)
 ):
     # Remove sensitive fields that shouldn't be updated directly
-    if "is_admin" in user_update:
-        del user_update["is_admin"]
-    if "password" in user_update:
-        del user_update["password"]
-
-    try:
-        db.begin_transaction()
-        updated_user = user_manager.update_user(current_user.id, **user_update)
-        db.commit()
-
-        if not updated_user:
+    user_update = {
+        k: v for k, v in user_update.items() if k not in USER_UPDATE_BLOCKLIST
+    }
+
+    def _update():
+        try:
+            with db.transaction():
+                updated_user = user_manager.update_user(current_user.id, **user_update)
+            invalidate_user_tokens(current_user.id)
+
+            if not updated_user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                )
+
+            return UserResponse.model_validate(updated_user)
+        except Exception as e:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error updating user: {str(e)}",
             )
 
-        return UserResponse(
-            id=updated_user.id,
-            username=updated_user.username,
-            email=updated_user.email,
-            is_admin=updated_user.is_admin,
-        )
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error updating user: {str(e)}",
-        )
+    return await run_db(_update)
 
 
 # Change password endpoint
@@ -320,29 +461,35 @@ async def change_password(
             detail="Both current_password and new_password are required",
         )
 
-    # Verify current password
-    user = user_manager.authenticate_user(
-        current_user.email, password_change["current_password"]
+    # Verify current password against the already loaded user; hashing needs no
+    # database access, so it runs in its own thread without holding the db lock
+    password_ok = current_user.is_active and await asyncio.to_thread(
+        User.verify_password,
+        password_change["current_password"],
+        current_user.password_hash,
+        current_user.salt,
     )
-    if not user:
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect",
         )
 
-    try:
-        db.begin_transaction()
-        user_manager.update_user(
-            current_user.id, password=password_change["new_password"]
-        )
-        db.commit()
-        return {"message": "Password changed successfully"}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error changing password: {str(e)}",
-        )
+    def _change_password():
+        try:
+            with db.transaction():
+                user_manager.update_user(
+                    current_user.id, password=password_change["new_password"]
+                )
+            invalidate_user_tokens(current_user.id)
+            return {"message": "Password changed successfully"}
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error changing password: {str(e)}",
+            )
+
+    return await run_db(_change_password)
 
 
 # --- ADMIN ENDPOINTS ---
@@ -350,20 +497,52 @@ async def change_password(
 
 # Get all users (admin only)
 @router.get("/admin/users", response_model=List[FullUserResponse])
-async def admin_get_all_users(current_user: User = Depends(get_admin_user)):
-    try:
-        users = db.session.query(User).all()
+async def admin_get_all_users(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_admin_user),
+):
+    def _list_users():
+        # Select only the response columns (never password hashes or salts) as
+        # plain rows, streamed in batches rather than loaded as ORM objects
+        query = (
+            db.session.query(
+                User.id,
+                User.username,
+                User.email,
+                User.is_admin,
+                User.is_active,
+                User.created_at,
+            )
+            .order_by(User.id)
+            .offset(offset)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.execution_options(stream_results=True).yield_per(1000)
+
+        # Rows come straight from the users table, so skip response validation
         return [
-            FullUserResponse(
-                id=user.id,
-                username=user.username,
-                email=user.email,
-                is_admin=user.is_admin,
-                is_active=user.is_active,
-                created_at=user.created_at.isoformat() if user.created_at else "",
+            FullUserResponse.model_construct(
+                id=row.id,
+                username=row.username,
+                email=row.email,
+                is_admin=row.is_admin,
+                is_active=row.is_active,
+                created_at=row.created_at.isoformat() if row.created_at else "",
             )
-            for user in users
+            for row in rows
         ]
+
+    cache_key = ("list", limit, offset)
+    cached, generation = _get_admin_cached(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        users = await run_db(_list_users)
+        _put_admin_cached(cache_key, users, generation)
+        return users
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -371,66 +550,103 @@ async def admin_get_all_users(current_user: User = Depends(get_admin_user)):
         )
 
 
+# Stream all users as newline-delimited JSON (admin only)
+@router.get("/admin/users.ndjson")
+async def admin_stream_users(current_user: User = Depends(get_admin_user)):
+    def _fetch_batch(after_id):
+        rows = (
+            db.session.query(
+                User.id,
+                User.username,
+                User.email,
+                User.is_admin,
+                User.is_active,
+                User.created_at,
+            )
+            .filter(User.id > after_id)
+            .order_by(User.id)
+            .limit(USER_STREAM_BATCH_SIZE)
+            .all()
+        )
+        lines = [
+            orjson.dumps(
+                {
+                    "id": row.id,
+                    "username": row.username,
+                    "email": row.email,
+                    "is_admin": row.is_admin,
+                    "is_active": row.is_active,
+                    "created_at": (
+                        row.created_at.isoformat() if row.created_at else ""
+                    ),
+                }
+            )
+            + b"\n"
+            for row in rows
+        ]
+        return lines, (rows[-1].id if rows else None)
+
+    async def _generate():
+        # Page by primary key so the db lock is only held for one batch at a time
+        last_id = 0
+        while True:
+            lines, last_id = await run_db(_fetch_batch, last_id)
+            if lines:
+                yield b"".join(lines)
+            if last_id is None or len(lines) < USER_STREAM_BATCH_SIZE:
+                break
+
+    return StreamingResponse(_generate(), media_type="application/x-ndjson")
+
+
 # Create new user (admin only)
 @router.post("/admin/users", response_model=FullUserResponse)
 async def admin_create_user(
     user_data: AdminUserCreate, current_user: User = Depends(get_admin_user)
 ):
-    try:
-        db.begin_transaction()
-
-        new_user = user_manager.register_user(
-            username=user_data.username,
-            email=user_data.email,
-            password=user_data.password,
-        )
-
-        if user_data.is_admin:
-            new_user.is_admin = True
-            db.session.commit()
-
-        if not db.commit():
+    def _create_user():
+        try:
+            with db.transaction():
+                new_user = user_manager.register_user(
+                    username=user_data.username,
+                    email=user_data.email,
+                    password=user_data.password,
+                )
+
+                if user_data.is_admin:
+                    new_user.is_admin = True
+            clear_admin_cache()
+
+            return FullUserResponse.model_validate(new_user)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to commit the transaction",
+                detail=f"Error creating user: {str(e)}",
             )
 
-        return FullUserResponse(
-            id=new_user.id,
-            username=new_user.username,
-            email=new_user.email,
-            is_admin=new_user.is_admin,
-            is_active=new_user.is_active,
-            created_at=new_user.created_at.isoformat() if new_user.created_at else "",
-        )
-    except ValueError as e:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creating user: {str(e)}",
-        )
+    return await run_db(_create_user)
 
 
 # Get user by ID (admin only)
 @router.get("/admin/users/{user_id}", response_model=FullUserResponse)
 async def admin_get_user(user_id: int, current_user: User = Depends(get_admin_user)):
-    user = user_manager.get_user_by_id(user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
+    def _get_user():
+        user = user_manager.get_user_by_id(user_id)
+        return FullUserResponse.model_validate(user) if user else None
 
-    return FullUserResponse(
-        id=user.id,
-        username=user.username,
-        email=user.email,
-        is_admin=user.is_admin,
-        is_active=user.is_active,
-        created_at=user.created_at.isoformat() if user.created_at else "",
-    )
+    cache_key = ("user", user_id)
+    user, generation = _get_admin_cached(cache_key)
+    if user is None:
+        user = await run_db(_get_user)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+        _put_admin_cached(cache_key, user, generation)
+
+    return user
 
 
 # Update user by ID (admin only)
@@ -445,39 +661,31 @@ async def admin_update_user(
             detail="Cannot remove your own admin privileges",
         )
 
-    try:
-        db.begin_transaction()
-
-        # Convert to dict and remove None values
-        update_data = {k: v for k, v in user_data.dict().items() if v is not None}
-
-        # Update user
-        updated_user = user_manager.update_user(user_id, **update_data)
-
-        if not updated_user:
-            db.rollback()
+    def _update_user():
+        try:
+            # Convert to dict and remove None values
+            update_data = {k: v for k, v in user_data.dict().items() if v is not None}
+
+            with db.transaction():
+                # Update user
+                updated_user = user_manager.update_user(user_id, **update_data)
+
+                if not updated_user:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                    )
+            invalidate_user_tokens(user_id)
+
+            return FullUserResponse.model_validate(updated_user)
+        except HTTPException:
+            raise
+        except Exception as e:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error updating user: {str(e)}",
             )
 
-        db.commit()
-
-        return FullUserResponse(
-            id=updated_user.id,
-            username=updated_user.username,
-            email=updated_user.email,
-            is_admin=updated_user.is_admin,
-            is_active=updated_user.is_active,
-            created_at=(
-                updated_user.created_at.isoformat() if updated_user.created_at else ""
-            ),
-        )
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error updating user: {str(e)}",
-        )
+    return await run_db(_update_user)
 
 
 # Delete user by ID (admin only)
@@ -489,25 +697,26 @@ async def admin_delete_user(user_id: int, current_user: User = Depends(get_admin
             detail="Cannot delete your own account",
         )
 
-    try:
-        user = user_manager.get_user_by_id(user_id)
-        if not user:
+    def _delete_user():
+        try:
+            user = user_manager.get_user_by_id(user_id)
+            if not user:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                )
+
+            # Deactivate the user instead of hard delete
+            with db.transaction():
+                user.is_active = False
+            invalidate_user_tokens(user_id)
+
+            return {"message": "User deactivated successfully"}
+        except HTTPException:
+            raise
+        except Exception as e:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error deleting user: {str(e)}",
             )
 
-        # Deactivate the user instead of hard delete
-        db.begin_transaction()
-        user.is_active = False
-        db.session.commit()
-        db.commit()
-
-        return {"message": "User deactivated successfully"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error deleting user: {str(e)}",
-        )
+    return await run_db(_delete_user)
@@ -6,22 +6,38 @@ from sqlalchemy import (
     Float,
     ForeignKey,
     DateTime,
-    JSON,
     inspect,
     text,
     Boolean,
+    func,
+    lambda_stmt,
+    select,
+    insert,
+    or_,
+    literal,
+    case,
+    FetchedValue,
 )
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from contextlib import contextmanager
+import logging
 import os
-import json
 import time
+import orjson
 from app.db.user_model import User, Base as UserBase
 from dotenv import load_dotenv
 
+logger = logging.getLogger("db_operations")
+
 Base = declarative_base()
 
+# Timestamps are filled in by Postgres; columns are naive UTC like before.
+# updated_at is maintained by the set_updated_at trigger (see _ensure_all_columns).
+UTC_NOW = text("(now() at time zone 'utc')")
+TIMESTAMPED_TABLES = ("menu_items", "add_ons", "orders", "customers", "restaurants")
+
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
@@ -32,8 +48,10 @@ class MenuItem(Base):
     base_price = Column(Float, nullable=False)
     description = Column(String)
     is_available = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
+    updated_at = Column(
+        DateTime, server_default=UTC_NOW, server_onupdate=FetchedValue()
+    )
 
 
 class AddOn(Base):
@@ -45,8 +63,10 @@ class AddOn(Base):
     category = Column(String, nullable=False)  # 'burger', 'pizza', etc.
     type = Column(String, nullable=True)  # 'topping', 'size', 'drink', etc.
     is_available = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
+    updated_at = Column(
+        DateTime, server_default=UTC_NOW, server_onupdate=FetchedValue()
+    )
 
 
 class Order(Base):
@@ -54,18 +74,22 @@ class Order(Base):
 
     id = Column(Integer, primary_key=True)
     customer_id = Column(Integer, ForeignKey("customers.id"))
+    customer = relationship("Customer", back_populates="orders")
     customer_name = Column(String, nullable=False)
     customer_phone = Column(String, nullable=False)
-    order_items = Column(JSON, nullable=False)  # Store order items as JSON
+    order_items = Column(JSONB, nullable=False)  # Store order items as JSONB
     total_amount = Column(Float, nullable=False)
     status = Column(
         String, default="pending"
     )  # pending, confirmed, preparing, ready, delivered
     estimated_preparation_time = Column(Integer)  # in minutes
+    items_count = Column(Integer)  # len(order_items), so counts never parse JSON
     payment_method = Column(String)
     special_instructions = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
+    updated_at = Column(
+        DateTime, server_default=UTC_NOW, server_onupdate=FetchedValue()
+    )
 
 
 class Customer(Base):
@@ -78,11 +102,13 @@ class Customer(Base):
     preferred_payment_method = Column(String)
     last_order_date = Column(DateTime)
     total_orders = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
+    updated_at = Column(
+        DateTime, server_default=UTC_NOW, server_onupdate=FetchedValue()
+    )
 
     # Relationship with orders
-    orders = relationship("Order", backref="customer", lazy=True)
+    orders = relationship("Order", back_populates="customer", lazy=True)
 
 
 class Restaurant(Base):
@@ -95,12 +121,66 @@ class Restaurant(Base):
     email = Column(String)
     opening_hours = Column(String)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
+    updated_at = Column(
+        DateTime, server_default=UTC_NOW, server_onupdate=FetchedValue()
+    )
+
+
+# Built once; create_order only supplies the parameters. Rows come back in
+# parameter order so bulk inserts can be matched to their input.
+ORDER_INSERT_STMT = insert(Order).returning(Order, sort_by_parameter_order=True)
+
+# Menu and add-ons change rarely but are read on every order turn; keep them
+# in-process for a short while. Admin edits call clear_menu_cache().
+MENU_CACHE_TTL = 60
+MENU_CACHE_SIZE = 512
+_menu_cache = {}  # (kind, ...) -> (rows, expires_at)
+
+
+def _get_menu_cached(key, load):
+    """Return cached rows for key, loading and caching them when stale."""
+    entry = _menu_cache.get(key)
+    if entry is None or entry[1] <= time.time():
+        # Fuzzy-match keys come from caller input, so bound the cache by
+        # starting over
+        if len(_menu_cache) >= MENU_CACHE_SIZE:
+            _menu_cache.clear()
+        entry = (load(), time.time() + MENU_CACHE_TTL)
+        _menu_cache[key] = entry
+    # Hand out a copy so callers can't reorder or extend the cached list
+    return list(entry[0])
+
+
+def clear_menu_cache():
+    """Drop cached menu and add-on rows after any change to those tables."""
+    _menu_cache.clear()
+
+
+# Database URL -> Engine, shared by every Database instance in the process
+_engines = {}
+# Engine -> whether the pg_trgm extension is installed, checked once
+_pg_trgm_installed = {}
+
+# Bump whenever _ensure_all_columns or the models gain schema changes
+SCHEMA_VERSION = 7
+# Key for the Postgres advisory lock that serializes schema sync across workers
+SCHEMA_LOCK_ID = 8675309
 
 
 class Database:
-    def __init__(self):
+    # Set once this process has synced the schema
+    _schema_synced = False
+
+    def __init__(self, sync_schema=None):
+        """
+        Connect to Postgres and, unless disabled, sync the schema.
+
+        Args:
+            sync_schema: Run the schema sync on first construction. Defaults to
+                the DATABASE_SCHEMA_SYNC env var ("0" turns it off, for
+                deployments that run it once from init_db before serving).
+        """
         try:
             # First try to load ../.env
             if os.path.exists("../.env"):
@@ -123,33 +203,105 @@ class Database:
             database_url = (
                 f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
             )
-            self.engine = create_engine(database_url)
-
-            # Create all tables including User table from user_model
-            Base.metadata.create_all(self.engine)
-            UserBase.metadata.create_all(self.engine)
+            # Endpoints construct a Database per request, so they all share one
+            # engine (and its connection pool) per URL
+            self.engine = _engines.get(database_url)
+            if self.engine is None:
+                # Batch multi-row INSERTs and executemany UPDATEs/DELETEs
+                # instead of one statement per row
+                self.engine = _engines[database_url] = create_engine(
+                    database_url,
+                    executemany_mode="values_plus_batch",
+                    insertmanyvalues_page_size=1000,
+                    executemany_batch_page_size=500,
+                    # Sized for concurrent short-lived read sessions next to
+                    # the shared unit-of-work session; stale connections are
+                    # replaced
+                    pool_size=30,
+                    max_overflow=10,
+                    pool_recycle=3600,
+                    pool_pre_ping=True,
+                    # orjson encodes the JSONB columns much faster than the
+                    # stdlib json module SQLAlchemy uses by default
+                    json_serializer=lambda value: orjson.dumps(value).decode(),
+                    json_deserializer=orjson.loads,
+                )
 
-            # Initialize session
-            Session = sessionmaker(bind=self.engine)
-            self.session = Session()
+            if sync_schema is None:
+                sync_schema = os.environ.get("DATABASE_SCHEMA_SYNC", "1") != "0"
 
-            # Ensure all required columns exist
-            self._ensure_all_columns()
+            # Create tables and columns once per process and schema version
+            if sync_schema and not Database._schema_synced:
+                self._sync_schema()
+                Database._schema_synced = True
 
-            # Initialize restaurant data if none exists
-            self._initialize_restaurant()
+            # Catalog reads get their own short-lived session; objects stay
+            # readable after it closes because nothing expires them
+            self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
 
-            # Make sure User table exists
-            self._ensure_user_table()
+            # Shared session for customer/order writes that span several calls.
+            # It lives for a whole call, so commits expire what it holds and
+            # the next access reloads it.
+            self.session = self.Session(expire_on_commit=True)
 
         except Exception as e:
-            print(f"Error initializing database: {e}")
+            logger.error("Error initializing database: %s", e)
             raise
 
+    def _sync_schema(self):
+        """Create tables and columns unless this schema version is recorded.
+
+        Workers serialize on an advisory lock; the first one runs the DDL and
+        records SCHEMA_VERSION, the rest find the row and skip the catalog work.
+        The default restaurant is seeded here too, once per process.
+        """
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": SCHEMA_LOCK_ID})
+            try:
+                conn.execute(
+                    text(
+                        "CREATE TABLE IF NOT EXISTS schema_version "
+                        "(version INTEGER PRIMARY KEY, applied_at TIMESTAMP DEFAULT now())"
+                    )
+                )
+                synced = conn.execute(
+                    text("SELECT 1 FROM schema_version WHERE version = :v"),
+                    {"v": SCHEMA_VERSION},
+                ).first()
+                conn.commit()
+                if synced is None:
+                    # Create all tables including User table from user_model
+                    Base.metadata.create_all(self.engine)
+                    UserBase.metadata.create_all(self.engine)
+
+                    # Ensure all required columns exist
+                    self._ensure_all_columns()
+
+                    # Make sure User table exists
+                    self._ensure_user_table()
+
+                    conn.execute(
+                        text(
+                            "INSERT INTO schema_version (version) VALUES (:v) "
+                            "ON CONFLICT DO NOTHING"
+                        ),
+                        {"v": SCHEMA_VERSION},
+                    )
+                    conn.commit()
+
+                # Seed under the same lock so two workers can't both insert
+                self._initialize_restaurant(conn)
+                conn.commit()
+            finally:
+                # Session-level lock: it outlives a rollback of failed DDL
+                conn.rollback()
+                conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": SCHEMA_LOCK_ID}
+                )
+                conn.commit()
+
     def _ensure_all_columns(self):
         """Ensure all required columns exist in all tables."""
-        inspector = inspect(self.engine)
-
         # Check and add columns for customers table
         customer_columns = {
             "name": "VARCHAR",
@@ -167,120 +319,293 @@ class Database:
             "customer_id": "INTEGER",
             "customer_name": "VARCHAR",
             "customer_phone": "VARCHAR",
-            "order_items": "JSON",
+            "order_items": "JSONB",
             "total_amount": "FLOAT",
             "status": "VARCHAR",
             "estimated_preparation_time": "INTEGER",
             "payment_method": "VARCHAR",
             "special_instructions": "VARCHAR",
+            "items_count": "INTEGER",
             "created_at": "TIMESTAMP",
             "updated_at": "TIMESTAMP",
         }
 
-        # Add missing columns to customers table
-        existing_customer_columns = [
-            col["name"] for col in inspector.get_columns("customers")
+        # One idempotent ALTER per table; IF NOT EXISTS skips present columns
+        statements = [
+            f"ALTER TABLE {table} "
+            + ", ".join(
+                f"ADD COLUMN IF NOT EXISTS {column} {type_}"
+                for column, type_ in columns.items()
+            )
+            for table, columns in (
+                ("customers", customer_columns),
+                ("orders", order_columns),
+            )
         ]
-        with self.engine.connect() as conn:
-            for column, type_ in customer_columns.items():
-                if column not in existing_customer_columns:
-                    conn.execute(
-                        text(f"ALTER TABLE customers ADD COLUMN {column} {type_}")
-                    )
 
-            # Add missing columns to orders table
-            existing_order_columns = [
-                col["name"] for col in inspector.get_columns("orders")
+        # Older databases stored order_items as text JSON
+        statements.append(
+            "ALTER TABLE orders ALTER COLUMN order_items "
+            "TYPE JSONB USING order_items::jsonb"
+        )
+
+        # Backfill items_count for orders written before the column existed
+        statements.append(
+            "UPDATE orders SET items_count = jsonb_array_length(order_items) "
+            "WHERE items_count IS NULL AND jsonb_typeof(order_items) = 'array'"
+        )
+
+        # Server-side timestamps: defaults for inserts, a trigger for updates
+        statements.append(
+            "CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$ "
+            "BEGIN NEW.updated_at = now() at time zone 'utc'; RETURN NEW; END; "
+            "$$ LANGUAGE plpgsql"
+        )
+        for table in TIMESTAMPED_TABLES:
+            statements += [
+                f"ALTER TABLE {table} "
+                f"ALTER COLUMN created_at SET DEFAULT {UTC_NOW.text}, "
+                f"ALTER COLUMN updated_at SET DEFAULT {UTC_NOW.text}",
+                f"DROP TRIGGER IF EXISTS {table}_set_updated_at ON {table}",
+                f"CREATE TRIGGER {table}_set_updated_at BEFORE UPDATE ON {table} "
+                "FOR EACH ROW EXECUTE FUNCTION set_updated_at()",
             ]
-            for column, type_ in order_columns.items():
-                if column not in existing_order_columns:
-                    conn.execute(
-                        text(f"ALTER TABLE orders ADD COLUMN {column} {type_}")
-                    )
 
-            # Add foreign key constraint if it doesn't exist
+        # Indexes for the hot filters; menu and add-on reads always ask for
+        # available rows, so those are partial. customers.phone is already
+        # covered by its unique constraint, and orders.customer_phone lookups
+        # by the leading column of idx_orders_phone_created. Postgres does not
+        # index foreign keys on its own.
+        statements += [
+            "CREATE INDEX IF NOT EXISTS idx_menu_cat_avail "
+            "ON menu_items (category) WHERE is_available = 1",
+            "CREATE INDEX IF NOT EXISTS idx_addon_cat_avail "
+            "ON add_ons (category) WHERE is_available = 1",
+            "CREATE INDEX IF NOT EXISTS idx_orders_phone_created "
+            "ON orders (customer_phone, created_at DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_orders_customer_id "
+            "ON orders (customer_id)",
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_created "
+            "ON orders (status, created_at DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_orders_created_status "
+            "ON orders (created_at, status)",
+        ]
+
+        with self.engine.connect() as conn:
+            # Every statement is idempotent, so send them as one script in a
+            # single round trip
+            conn.execute(text(";\n".join(statements)))
+
+            # Add foreign key constraint if it doesn't exist. Existing rows may
+            # violate it, so a failure only rolls back this savepoint.
             try:
-                conn.execute(
-                    text(
-                        """
-                    DO $$ 
-                    BEGIN 
-                        IF NOT EXISTS (
-                            SELECT 1 
-                            FROM information_schema.table_constraints 
-                            WHERE constraint_name = 'orders_customer_id_fkey'
-                        ) THEN
-                            ALTER TABLE orders 
-                            ADD CONSTRAINT orders_customer_id_fkey 
-                            FOREIGN KEY (customer_id) 
-                            REFERENCES customers(id);
-                        END IF;
-                    END $$;
-                """
+                with conn.begin_nested():
+                    fk_exists = conn.execute(
+                        text(
+                            "SELECT 1 FROM information_schema.table_constraints "
+                            "WHERE constraint_name = 'orders_customer_id_fkey'"
+                        )
+                    ).first()
+                    if fk_exists is None:
+                        conn.execute(
+                            text(
+                                "ALTER TABLE orders ADD CONSTRAINT orders_customer_id_fkey "
+                                "FOREIGN KEY (customer_id) REFERENCES customers(id)"
+                            )
+                        )
+            except Exception as e:
+                logger.warning("Could not add foreign key constraint: %s", e)
+
+            # Trigram matching for misheard item names. Creating an extension
+            # needs privileges the app role may not have; without it
+            # find_similar_menu_item keeps to exact and substring matches.
+            try:
+                with conn.begin_nested():
+                    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    conn.execute(
+                        text(
+                            "CREATE INDEX IF NOT EXISTS idx_menu_name_trgm "
+                            "ON menu_items USING GIN (lower(name) gin_trgm_ops)"
+                        )
                     )
-                )
             except Exception as e:
-                print(f"Warning: Could not add foreign key constraint: {e}")
+                logger.warning("Could not enable pg_trgm: %s", e)
 
             conn.commit()
 
-    def _initialize_restaurant(self):
+    def _initialize_restaurant(self, conn):
         """Initialize restaurant data if none exists."""
-        restaurant_count = self.session.query(Restaurant).count()
-        if restaurant_count == 0:
-            restaurant = Restaurant(
-                name="Tote AI Restaurant",
-                address="123 Main Street, Downtown, CA 94123",
-                phone="(555) 123-4567",
-                email="info@toteairestaurant.com",
-                opening_hours="Monday-Sunday: 11:00 AM - 10:00 PM",
+        # EXISTS stops at the first row instead of counting the whole table
+        if not conn.execute(select(select(Restaurant.id).exists())).scalar():
+            name = "Tote AI Restaurant"
+            conn.execute(
+                insert(Restaurant).values(
+                    name=name,
+                    address="123 Main Street, Downtown, CA 94123",
+                    phone="(555) 123-4567",
+                    email="info@toteairestaurant.com",
+                    opening_hours="Monday-Sunday: 11:00 AM - 10:00 PM",
+                )
             )
-            self.session.add(restaurant)
-            self.session.commit()
-            print(f"Initialized restaurant data: {restaurant.name}")
+            logger.info("Initialized restaurant data: %s", name)
 
     def get_restaurant(self):
         """Get the restaurant information."""
-        return (
-            self.session.query(Restaurant).filter(Restaurant.is_active == True).first()
-        )
+        with self.Session() as session:
+            return (
+                session.query(Restaurant).filter(Restaurant.is_active == True).first()
+            )
 
     def get_menu(self, category=None):
-        query = self.session.query(MenuItem)
+        return _get_menu_cached(("menu", category), lambda: self._load_menu(category))
+
+    def _load_menu(self, category):
+        # Lambda statements are built once and reused from the SQL cache.
+        # Plain column rows keep attribute access (item.name) without building
+        # ORM instances for read-only data.
+        stmt = lambda_stmt(
+            lambda: select(*MenuItem.__table__.c).where(MenuItem.is_available == 1)
+        )
+        if category:
+            stmt += lambda s: s.where(MenuItem.category == category)
+        with self.Session() as session:
+            return session.execute(stmt).all()
+
+    def get_menu_rows(self, category=None):
+        """Get available menu items with only the columns the agent reads."""
+        return _get_menu_cached(
+            ("menu_rows", category), lambda: self._load_menu_rows(category)
+        )
+
+    def _load_menu_rows(self, category):
+        stmt = select(
+            MenuItem.id,
+            MenuItem.name,
+            MenuItem.category,
+            MenuItem.base_price,
+            MenuItem.description,
+            MenuItem.is_available,
+        ).where(MenuItem.is_available == 1)
         if category:
-            query = query.filter(MenuItem.category == category)
-        return query.filter(MenuItem.is_available == 1).all()
+            stmt = stmt.where(MenuItem.category == category)
+        with self.Session() as session:
+            return session.execute(stmt).all()
 
     def get_add_ons(self, category=None):
-        query = self.session.query(AddOn)
+        return _get_menu_cached(
+            ("add_ons", category), lambda: self._load_add_ons(category)
+        )
+
+    def _load_add_ons(self, category):
+        stmt = select(*AddOn.__table__.c).where(AddOn.is_available == 1)
         if category:
-            query = query.filter(AddOn.category == category)
-        return query.filter(AddOn.is_available == 1).all()
+            stmt = stmt.where(AddOn.category == category)
+        with self.Session() as session:
+            return session.execute(stmt).all()
+
+    def find_menu_items_bulk(self, names):
+        """Get menu items by exact, case-insensitive name in one query."""
+        lowered = {name.lower() for name in names if name}
+        if not lowered:
+            return {}
+        with self.Session() as session:
+            items = (
+                session.query(MenuItem)
+                .filter(func.lower(MenuItem.name).in_(list(lowered)))
+                .all()
+            )
+        return {item.name.lower(): item for item in items}
+
+    def find_similar_menu_items_bulk(self, names):
+        """
+        Resolve several spoken item names, keyed by lowercased name.
+
+        Exact names come back from one query; only the misses fall back to
+        find_similar_menu_item, which is itself cached. Unmatched names map
+        to None.
+        """
+        found = self.find_menu_items_bulk(names)
+        for name in names:
+            key = name.lower()
+            if key not in found:
+                found[key] = self.find_similar_menu_item(name)
+        return found
+
+    def get_add_ons_by_category(self, categories):
+        """Get available add-ons for several categories from the menu cache."""
+        return {category: self.get_add_ons(category) for category in set(categories)}
+
+    def get_menu_bundle(self):
+        """Get everything the agent needs to present the menu in one call."""
+        menu_items = self.get_menu_rows()
+
+        # Group available items by category once, for prompt rendering
+        items_by_category = {}
+        for item in menu_items:
+            items_by_category.setdefault(item.category, []).append(item)
+
+        return {
+            "categories": list(items_by_category),
+            "items": items_by_category,
+            "menu_items": menu_items,
+            "add_ons": self.get_add_ons(),
+            "restaurant": self.get_restaurant(),
+        }
 
     def find_similar_menu_item(self, item_name, category=None):
         if not item_name:
             return None
 
         item_name_lower = item_name.lower()
-        query = self.session.query(MenuItem)
+        matches = _get_menu_cached(
+            ("similar", item_name_lower, category),
+            lambda: self._load_similar_menu_item(item_name_lower, category),
+        )
+        return matches[0] if matches else None
 
-        if category:
-            query = query.filter(MenuItem.category == category)
+    def _has_pg_trgm(self):
+        """Return whether pg_trgm is installed, checking once per engine."""
+        if self.engine not in _pg_trgm_installed:
+            with self.engine.connect() as conn:
+                _pg_trgm_installed[self.engine] = (
+                    conn.execute(
+                        text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                    ).first()
+                    is not None
+                )
+        return _pg_trgm_installed[self.engine]
 
-        # Try exact match first
-        exact_match = query.filter(MenuItem.name.ilike(item_name_lower)).first()
-        if exact_match:
-            return exact_match
+    def _load_similar_menu_item(self, item_name_lower, category):
+        name_lower = func.lower(MenuItem.name)
+        stmt = select(MenuItem)
 
-        # Try contains match
-        for item in query.all():
-            if (
-                item_name_lower in item.name.lower()
-                or item.name.lower() in item_name_lower
-            ):
-                return item
+        if category:
+            stmt = stmt.where(MenuItem.category == category)
+
+        # One round trip: an exact (case-insensitive) match wins, then the
+        # closest-length item whose name contains the query or is contained in
+        # it, then (with pg_trgm) the most trigram-similar name
+        is_substring = or_(
+            name_lower.contains(item_name_lower, autoescape=True),
+            literal(item_name_lower).contains(name_lower),
+        )
+        rank = [
+            case(
+                (name_lower == item_name_lower, 0),
+                (is_substring, 1),
+                else_=2,
+            )
+        ]
+        if self._has_pg_trgm():
+            # % uses the GIN trigram index and pg_trgm's similarity threshold
+            stmt = stmt.where(or_(is_substring, name_lower.op("%")(item_name_lower)))
+            rank.append(func.similarity(name_lower, item_name_lower).desc())
+        else:
+            stmt = stmt.where(is_substring)
 
-        return None
+        stmt = stmt.order_by(*rank, func.length(MenuItem.name), MenuItem.id).limit(1)
+        with self.Session() as session:
+            return session.scalars(stmt).all()
 
     def create_customer(self, name, phone, auto_commit=False, **kwargs):
         try:
@@ -295,21 +620,20 @@ class Database:
             # Auto-commit if requested
             if auto_commit:
                 if not self.safe_commit():
-                    print("Failed to commit customer creation after multiple retries")
+                    logger.error("Failed to commit customer creation")
                     raise Exception("Failed to commit customer creation")
 
             return customer
         except Exception as e:
-            import traceback
-
-            print(f"Error creating customer: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error creating customer: %s", e)
             self.session.rollback()
             raise
 
     def get_customer_by_phone(self, phone):
         # Search by phone as string
-        return self.session.query(Customer).filter(Customer.phone == str(phone)).first()
+        phone = str(phone)
+        stmt = lambda_stmt(lambda: select(Customer).where(Customer.phone == phone))
+        return self.session.scalars(stmt).first()
 
     def update_customer(self, phone, auto_commit=False, **kwargs):
         # Find customer by phone (as string)
@@ -330,26 +654,50 @@ class Database:
             # Auto-commit if requested
             if auto_commit:
                 if not self.safe_commit():
-                    print("Failed to commit customer update after multiple retries")
+                    logger.error("Failed to commit customer update")
                     raise Exception("Failed to commit customer update")
 
             return customer
         except Exception as e:
-            import traceback
+            logger.exception("Error updating customer: %s", e)
+            self.session.rollback()
+            raise
+
+    def upsert_customer(self, name, phone, auto_commit=False, **kwargs):
+        """Create the customer, or update the one with this phone, atomically."""
+        try:
+            values = {"name": name, **kwargs}
+            stmt = (
+                pg_insert(Customer)
+                .values(phone=str(phone), **values)
+                .on_conflict_do_update(index_elements=[Customer.phone], set_=values)
+                .returning(Customer)
+            )
+            customer = self.session.scalars(
+                stmt, execution_options={"populate_existing": True}
+            ).one()
 
-            print(f"Error updating customer: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
+            # Auto-commit if requested
+            if auto_commit:
+                if not self.safe_commit():
+                    logger.error("Failed to commit customer upsert")
+                    raise Exception("Failed to commit customer upsert")
+
+            return customer
+        except Exception as e:
+            logger.exception("Error upserting customer: %s", e)
             self.session.rollback()
             raise
 
     def get_customer_order_history(self, phone):
-        # Find orders by phone (as string)
-        return (
-            self.session.query(Order)
-            .filter(Order.customer_phone == str(phone))
+        # Find orders by phone (as string); read-only, so plain column rows
+        stmt = (
+            select(*Order.__table__.c)
+            .where(Order.customer_phone == str(phone))
             .order_by(Order.created_at.desc())
-            .all()
         )
+        with self.Session() as session:
+            return session.execute(stmt).all()
 
     def create_order(
         self,
@@ -361,107 +709,164 @@ class Database:
         special_instructions=None,
         auto_commit=False,
     ):
+        """Upsert the customer and insert the order in the current transaction.
+
+        Both are single RETURNING statements, so there is no flush; nothing is
+        committed unless auto_commit is set.
+        """
         try:
             # Store customer_phone as string
             customer_phone_str = str(customer_phone)
-            print(f"Creating order for: {customer_name}, phone: {customer_phone_str}")
-
-            # Check if customer exists
-            customer = self.get_customer_by_phone(customer_phone_str)
-            if not customer:
-                print(f"Customer not found, creating new customer: {customer_name}")
-                # Create a new customer with minimal information
-                try:
-                    customer = Customer(
-                        name=customer_name,
-                        phone=customer_phone_str,
-                    )
-                    self.session.add(customer)
-                    self.session.flush()  # Get ID without committing yet
-                    print(f"New customer created with ID: {customer.id}")
-                except Exception as e:
-                    print(f"Error creating customer: {e}")
-                    self.session.rollback()
-                    raise
-
-            # Update customer's last order date and total orders
-            print(f"Updating customer data for ID: {customer.id}")
-            customer.last_order_date = datetime.utcnow()
-            customer.total_orders += 1
+            logger.debug(
+                "Creating order for: %s, phone: %s", customer_name, customer_phone_str
+            )
 
-            # Calculate estimated preparation time
-            estimated_preparation_time = self._calculate_preparation_time(order_items)
-            print(f"Estimated preparation time: {estimated_preparation_time} minutes")
+            # Create or update the customer and bump their order stats in a
+            # single INSERT ... ON CONFLICT round trip
+            customers = Customer.__table__.c
+            insert_customer = pg_insert(Customer).values(
+                name=customer_name,
+                phone=customer_phone_str,
+                last_order_date=UTC_NOW,  # stamped by Postgres, like created_at
+                total_orders=1,
+            )
+            upsert = (
+                insert_customer.on_conflict_do_update(
+                    index_elements=[Customer.phone],
+                    set_={
+                        "last_order_date": insert_customer.excluded.last_order_date,
+                        "total_orders": func.coalesce(customers.total_orders, 0) + 1,
+                    },
+                )
+                .returning(Customer)
+            )
+            customer = self.session.scalars(
+                upsert, execution_options={"populate_existing": True}
+            ).one()
+            logger.debug("Customer upserted with ID: %s", customer.id)
 
-            # Create the order
-            print(
-                f"Creating order with: {len(order_items)} items, total: ${total_amount}"
+            # Calculate estimated preparation time
+            items_count = len(order_items)
+            estimated_preparation_time = self._calculate_preparation_time(items_count)
+            logger.debug(
+                "Estimated preparation time: %s minutes", estimated_preparation_time
             )
 
-            # Ensure order_items is properly serialized as JSON
-            order_items_json = order_items
-            if not isinstance(order_items, str):
-                try:
-                    # Check if we can serialize and deserialize it
-                    order_items_json = json.dumps(order_items)
-                    json.loads(order_items_json)
-                    print(
-                        f"Successfully serialized order_items: {order_items_json[:100]}"
-                    )
-                except Exception as e:
-                    print(f"Error serializing order_items: {e}")
-                    print(f"Original order_items: {order_items}")
-                    raise
-
-            order = Order(
-                customer_id=customer.id,
-                customer_name=customer_name,
-                customer_phone=customer_phone_str,
-                order_items=order_items,  # SQLAlchemy should handle JSON serialization
-                total_amount=total_amount,
-                payment_method=payment_method,
-                special_instructions=special_instructions,
-                estimated_preparation_time=estimated_preparation_time,
+            # Create the order
+            logger.debug(
+                "Creating order with: %d items, total: $%s",
+                items_count,
+                total_amount,
             )
-            self.session.add(order)
 
-            # Flush to get the ID but don't commit yet
-            self.session.flush()
-            print(f"Order prepared with ID: {order.id}")
+            # Insert and get the row back without a unit-of-work flush; not
+            # committed yet
+            order = self.session.scalars(
+                ORDER_INSERT_STMT,
+                [
+                    {
+                        "customer_id": customer.id,
+                        "customer_name": customer_name,
+                        "customer_phone": customer_phone_str,
+                        "order_items": order_items,  # Serialized by the JSONB type
+                        "total_amount": total_amount,
+                        "payment_method": payment_method,
+                        "special_instructions": special_instructions,
+                        "estimated_preparation_time": estimated_preparation_time,
+                        "items_count": items_count,
+                    }
+                ],
+            ).one()
+            logger.debug("Order prepared with ID: %s", order.id)
 
             # Auto-commit if requested
             if auto_commit:
                 if not self.safe_commit():
-                    print("Failed to commit order creation after multiple retries")
+                    logger.error("Failed to commit order creation")
                     raise Exception("Failed to commit order creation")
 
             return order
         except Exception as e:
-            import traceback
+            logger.exception("Unexpected error in create_order: %s", e)
+            self.session.rollback()
+            raise
+
+    def create_orders_bulk(self, orders, auto_commit=False):
+        """
+        Insert many orders at once, e.g. when importing or replaying them.
+
+        Args:
+            orders: Dicts with customer_name, customer_phone, order_items,
+                total_amount and optionally customer_id, payment_method and
+                special_instructions. Customers are not created or updated.
+            auto_commit: Commit after inserting
+
+        Returns:
+            The inserted Order objects, in input order
+        """
+        rows = []
+        for order in orders:
+            items_count = len(order["order_items"])
+            rows.append(
+                {
+                    "customer_id": order.get("customer_id"),
+                    "customer_name": order["customer_name"],
+                    "customer_phone": str(order["customer_phone"]),
+                    "order_items": order["order_items"],
+                    "total_amount": order["total_amount"],
+                    "payment_method": order.get("payment_method"),
+                    "special_instructions": order.get("special_instructions"),
+                    "estimated_preparation_time": self._calculate_preparation_time(
+                        items_count
+                    ),
+                    "items_count": items_count,
+                }
+            )
+        if not rows:
+            return []
 
-            print(f"Unexpected error in create_order: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
+        try:
+            # A parameter list makes this an executemany, which the engine
+            # sends as multi-row INSERT ... VALUES pages with RETURNING
+            inserted = self.session.scalars(ORDER_INSERT_STMT, rows).all()
+            logger.debug("Inserted %d orders in bulk", len(inserted))
+
+            # Auto-commit if requested
+            if auto_commit:
+                if not self.safe_commit():
+                    logger.error("Failed to commit bulk order creation")
+                    raise Exception("Failed to commit bulk order creation")
+
+            return inserted
+        except Exception as e:
+            logger.exception("Error creating orders in bulk: %s", e)
             self.session.rollback()
             raise
 
-    def _calculate_preparation_time(self, order_items):
+    def _calculate_preparation_time(self, items_count):
         # Simple implementation - can be made more sophisticated
         base_time = 20  # Base preparation time in minutes
-        items_count = len(order_items)
         return base_time + (items_count * 5)  # 5 minutes per additional item
 
+    def _get_order(self, order_id):
+        # Primary-key lookup; populate_existing still refreshes an order this
+        # long-lived session already holds, since staff update status elsewhere
+        return self.session.get(Order, order_id, populate_existing=True)
+
     def get_order_status(self, order_id):
-        return self.session.query(Order).filter(Order.id == order_id).first()
+        return self._get_order(order_id)
 
     def update_order_status(self, order_id, status, estimated_preparation_time=None):
-        order = self.session.query(Order).filter(Order.id == order_id).first()
+        order = self._get_order(order_id)
         if order:
             order.status = status
 
             # Update estimated preparation time if provided
             if estimated_preparation_time is not None:
-                print(
-                    f"Updating order {order_id} estimated_preparation_time to {estimated_preparation_time}"
+                logger.debug(
+                    "Updating order %s estimated_preparation_time to %s",
+                    order_id,
+                    estimated_preparation_time,
                 )
                 order.estimated_preparation_time = estimated_preparation_time
 
@@ -482,33 +887,24 @@ class Database:
         """Update an existing order with new items, total amount, etc."""
         try:
             # Find the order by ID
-            order = self.session.query(Order).filter(Order.id == order_id).first()
+            order = self.session.get(Order, order_id)
             if not order:
-                print(f"Order not found with ID: {order_id}")
+                logger.warning("Order not found with ID: %s", order_id)
                 return None
 
-            print(
-                f"Updating order {order_id} with {len(order_items) if order_items else 0} items"
+            logger.debug(
+                "Updating order %s with %d items",
+                order_id,
+                len(order_items) if order_items else 0,
             )
 
             # Update order fields if provided
             if order_items is not None:
-                # Ensure order_items is properly serialized as JSON if needed
-                if not isinstance(order_items, str):
-                    try:
-                        # Check if we can serialize and deserialize it
-                        json.dumps(order_items)
-                        order.order_items = order_items
-                        print(f"Successfully updated order items")
-                    except Exception as e:
-                        print(f"Error serializing updated order_items: {e}")
-                        raise
-                else:
-                    order.order_items = order_items
+                order.order_items = order_items
 
             if total_amount is not None:
                 order.total_amount = total_amount
-                print(f"Updated total amount to: ${total_amount}")
+                logger.debug("Updated total amount to: $%s", total_amount)
 
             if payment_method is not None:
                 order.payment_method = payment_method
@@ -519,35 +915,30 @@ class Database:
             if status is not None:
                 order.status = status
 
-            # If order items changed, recalculate the preparation time
+            # If order items changed, recalculate the count and preparation time
             if order_items is not None:
+                order.items_count = len(order_items)
                 estimated_preparation_time = self._calculate_preparation_time(
-                    order_items
+                    order.items_count
                 )
                 order.estimated_preparation_time = estimated_preparation_time
-                print(
-                    f"Updated preparation time to: {estimated_preparation_time} minutes"
+                logger.debug(
+                    "Updated preparation time to: %s minutes", estimated_preparation_time
                 )
 
-            # Update the updated_at timestamp
-            order.updated_at = datetime.utcnow()
-
             # Flush changes
             self.session.flush()
-            print(f"Order {order_id} updated successfully")
+            logger.debug("Order %s updated successfully", order_id)
 
             # Auto-commit if requested
             if auto_commit:
                 if not self.safe_commit():
-                    print("Failed to commit order update after multiple retries")
+                    logger.error("Failed to commit order update")
                     raise Exception("Failed to commit order update")
 
             return order
         except Exception as e:
-            import traceback
-
-            print(f"Error updating order: {e}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error updating order: %s", e)
             self.session.rollback()
             raise
 
@@ -557,7 +948,7 @@ class Database:
             self.session.commit()
             return True
         except Exception as e:
-            print(f"Error committing changes: {e}")
+            logger.error("Error committing changes: %s", e)
             self.session.rollback()
             return False
 
@@ -571,29 +962,33 @@ class Database:
         """Commit the current transaction."""
         return self.safe_commit()
 
+    @contextmanager
+    def transaction(self):
+        """Commit the work done in the block, or roll it back if the block raises."""
+        try:
+            yield
+        except BaseException:
+            self.rollback()
+            raise
+        if not self.commit():
+            raise RuntimeError("Failed to commit the transaction")
+
     def rollback(self):
         """Roll back the current transaction."""
         try:
             self.session.rollback()
             return True
         except Exception as e:
-            print(f"Error rolling back transaction: {e}")
+            logger.error("Error rolling back transaction: %s", e)
             return False
 
     def _ensure_user_table(self):
         """Ensure the User table exists and has the correct schema."""
-        inspector = inspect(self.engine)
-        user_table_exists = "users" in inspector.get_table_names()
-
-        if not user_table_exists:
-            print("Creating users table...")
-            UserBase.metadata.create_all(self.engine)
-
-            # Verify table was created
-            inspector = inspect(self.engine)
-            if "users" in inspector.get_table_names():
-                print("Users table created successfully")
-            else:
-                print("WARNING: Failed to create users table")
-        else:
-            print("Users table already exists")
+        if "users" in inspect(self.engine).get_table_names():
+            logger.debug("Users table already exists")
+            return
+
+        # create_all raises if the DDL fails, so there is no need to re-inspect
+        logger.info("Creating users table...")
+        UserBase.metadata.create_all(self.engine)
+        logger.info("Users table created successfully")
@@ -4,7 +4,8 @@ from sqlalchemy import inspect
 
 
 def init_database():
-    db = Database()
+    # Always sync the schema here, even when the server has it turned off
+    db = Database(sync_schema=True)
 
     # Ensure users table exists
     inspector = inspect(db.engine)
@@ -212,9 +213,6 @@ def init_database():
     for addon in add_ons:
         db.session.add(addon)
 
-    # for customer in customers:
-    #     db.session.add(customer)
-
     # Clear existing restaurants and add new one
     db.session.query(Restaurant).delete()
     db.session.add(restaurant)
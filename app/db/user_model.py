@@ -6,12 +6,17 @@ from sqlalchemy import (
     Boolean,
     create_engine,
     ForeignKey,
+    exists,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
 import os
+import functools
 import hashlib
+import hmac
+import logging
+import time
 import uuid
 import jwt
 from datetime import datetime, timedelta
@@ -19,6 +24,24 @@ from dotenv import load_dotenv
 
 load_dotenv("../.env")
 
+log = logging.getLogger("auth")
+
+# One decoder with the algorithm list bound once, instead of per request
+JWT_ALGORITHMS = ["HS256"]
+_jwt_decoder = jwt.PyJWT()
+
+
+@functools.lru_cache(maxsize=4096)
+def _decode_token(token, secret_key):
+    """
+    Verify a token's signature and return its (user_id, exp) claims.
+
+    Only successful decodes are cached; callers must still check exp, since a
+    cached token can expire after it was first verified.
+    """
+    payload = _jwt_decoder.decode(token, secret_key, algorithms=JWT_ALGORITHMS)
+    return payload["sub"], payload.get("exp")
+
 # Create a Base for table definition
 Base = declarative_base()
 
@@ -47,7 +70,7 @@ class User(Base):
     @staticmethod
     def verify_password(password, password_hash, salt):
         computed_hash, _ = User.hash_password(password, salt)
-        return computed_hash == password_hash
+        return hmac.compare_digest(computed_hash, password_hash)
 
 
 class UserManager:
@@ -62,14 +85,13 @@ class UserManager:
         Register a new user.
         Note: Transaction handling should be done by the caller.
         """
-        # Check if user with username or email already exists
-        existing_user = (
-            self.db_session.query(User)
-            .filter((User.username == username) | (User.email == email))
-            .first()
-        )
+        # Check if user with username or email already exists; EXISTS stops
+        # at the first match and loads no columns
+        user_exists = self.db_session.query(
+            exists().where((User.username == username) | (User.email == email))
+        ).scalar()
 
-        if existing_user:
+        if user_exists:
             raise ValueError("User with this username or email already exists")
 
         # Hash the password with a salt
@@ -104,7 +126,7 @@ class UserManager:
 
             return None
         except Exception as e:
-            print(f"Error in authenticate_user: {str(e)}")
+            log.error("Error in authenticate_user: %s", e)
             return None
 
     def generate_token(
@@ -123,13 +145,14 @@ class UserManager:
         if isinstance(token, bytes):
             token = token.decode("utf-8")
 
-        print(f"Generated token for user {user_id}: {token[:10]}...")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Generated token for user %s: %s...", user_id, token[:10])
         return token
 
     def verify_token(self, token):
         """Verify and decode a JWT token"""
         if not token:
-            print("Empty token received")
+            log.debug("Empty token received")
             return None
 
         try:
@@ -138,26 +161,27 @@ class UserManager:
                 token = token.decode("utf-8")
 
             # Remove 'Bearer ' prefix if present
-            if token.startswith("Bearer "):
-                token = token.replace("Bearer ", "")
+            token = token.removeprefix("Bearer ")
 
-            print(f"Verifying token: {token[:10]}...")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Verifying token: %s...", token[:10])
 
-            # Decode with HS256 algorithm
-            payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
+            # Decode with HS256 algorithm; repeat tokens skip the HMAC check
+            user_id, exp = _decode_token(token, self.secret_key)
+            if exp is not None and exp <= time.time():
+                log.debug("Token expired for user ID: %s", user_id)
+                return None
 
-            # Extract user_id from subject claim
-            user_id = payload["sub"]
-            print(f"Token verified successfully for user ID: {user_id}")
+            log.debug("Token verified successfully for user ID: %s", user_id)
             return user_id
         except jwt.ExpiredSignatureError as e:
-            print(f"Token expired: {str(e)}")
+            log.debug("Token expired: %s", e)
             return None
         except jwt.InvalidTokenError as e:
-            print(f"Invalid token: {str(e)}")
+            log.info("Invalid token: %s", e)
             return None
         except Exception as e:
-            print(f"Unexpected error verifying token: {str(e)}")
+            log.error("Unexpected error verifying token: %s", e)
             return None
 
     def get_user_by_id(self, user_id):
@@ -165,7 +189,7 @@ class UserManager:
         try:
             return self.db_session.query(User).filter_by(id=user_id).first()
         except Exception as e:
-            print(f"Error in get_user_by_id: {str(e)}")
+            log.error("Error in get_user_by_id: %s", e)
             return None
 
     def get_user_from_token(self, token):
@@ -176,7 +200,10 @@ class UserManager:
         return None
 
     def update_user(self, user_id, **kwargs):
-        """Update user details"""
+        """
+        Update user details.
+        Note: Transaction handling should be done by the caller.
+        """
         user = self.get_user_by_id(user_id)
         if not user:
             return None
@@ -191,7 +218,7 @@ class UserManager:
             elif hasattr(user, key):
                 setattr(user, key, value)
 
-        self.db_session.commit()
+        # Note: We don't commit here; the caller should handle the transaction.
         return user
 
 
@@ -230,10 +257,10 @@ if __name__ == "__main__":
     user_manager = UserManager(session)
 
     # Check if admin user exists
-    admin_user = session.query(User).filter_by(username="admin").first()
+    admin_exists = session.query(exists().where(User.username == "admin")).scalar()
 
     # Create admin user if it doesn't exist
-    if not admin_user:
+    if not admin_exists:
         try:
             admin_user = user_manager.register_user(
                 username="admin",
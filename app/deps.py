@@ -0,0 +1,15 @@
+"""
+Shared application dependencies.
+This file holds the process-wide Database and UserManager instances, so every
+module that imports them reuses one engine and connection pool.
+"""
+
+import os
+
+from app.db.database import Database
+from app.db.user_model import UserManager
+
+# Database() loads the .env file, so JWT_SECRET_KEY is available below
+db = Database()
+
+user_manager = UserManager(db.session, os.environ["JWT_SECRET_KEY"])
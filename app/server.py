@@ -22,19 +22,23 @@ from app.custom_types import (
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Union
 
-from app.agent.order_llm import OrderAgent
+from app.agent.order_llm import OrderAgent, warmup
 from app.auth_api import router as auth_router, get_current_user
 from app.db.user_model import User, UserManager
-from app.db.database import Database, MenuItem, AddOn, Restaurant, Order, Customer
+from app.db.database import (
+    Database,
+    MenuItem,
+    AddOn,
+    Restaurant,
+    Order,
+    Customer,
+    clear_menu_cache,
+)
 
 load_dotenv(override=True)
 app = FastAPI()
 retell = Retell(api_key=os.environ["RETELL_API_KEY"])
 
-# Initialize database and ensure all tables are created
-db = Database()
-print("Database initialized and tables created")
-
 # List of allowed ports for frontend dev
 ports = [3000]
 allow_origins = (
@@ -57,6 +61,15 @@ app.add_middleware(
 app.include_router(auth_router)
 
 
+# Warm the LLM connection at startup so the first caller doesn't pay for it
+@app.on_event("startup")
+async def warmup_llm():
+    try:
+        await warmup()
+    except Exception as e:
+        print(f"LLM warmup failed: {e}")
+
+
 # Handle webhook from Retell server. This is used to receive events from Retell server.
 # Including call_started, call_ended, call_analyzed
 @app.post("/webhook")
@@ -182,9 +195,15 @@ async def websocket_handler(websocket: WebSocket, call_id: str):
         print(f"LLM WebSocket connection closed for {call_id}")
 
 
+# The REST endpoints below only do blocking database work, so they are plain
+# functions: FastAPI runs them in its threadpool instead of on the event loop
+# that serves the call websockets. Each builds its own Database (and session)
+# on the shared connection pool.
+
+
 # API endpoints for menu items
 @app.get("/menu")
-async def get_menu_items(
+def get_menu_items(
     category: str = None, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -223,7 +242,7 @@ class MenuItemUpdate(BaseModel):
 
 # Create new menu item
 @app.post("/menu")
-async def create_menu_item(
+def create_menu_item(
     item: MenuItemCreate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -237,6 +256,7 @@ async def create_menu_item(
         )
         db.session.add(new_item)
         db.safe_commit()
+        clear_menu_cache()
         return {
             "id": new_item.id,
             "name": new_item.name,
@@ -256,14 +276,12 @@ async def create_menu_item(
 
 # Update menu item
 @app.put("/menu/{item_id}")
-async def update_menu_item(
+def update_menu_item(
     item_id: int, item: MenuItemUpdate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
     try:
-        existing_item = (
-            db.session.query(MenuItem).filter(MenuItem.id == item_id).first()
-        )
+        existing_item = db.session.get(MenuItem, item_id)
         if not existing_item:
             raise HTTPException(status_code=404, detail="Menu item not found")
 
@@ -279,6 +297,7 @@ async def update_menu_item(
             existing_item.is_available = 1 if item.is_available else 0
 
         db.safe_commit()
+        clear_menu_cache()
         return {
             "id": existing_item.id,
             "name": existing_item.name,
@@ -300,19 +319,18 @@ async def update_menu_item(
 
 # Delete menu item
 @app.delete("/menu/{item_id}")
-async def delete_menu_item(
+def delete_menu_item(
     item_id: int, current_user: User = Depends(get_current_user)
 ):
     db = Database()
     try:
-        existing_item = (
-            db.session.query(MenuItem).filter(MenuItem.id == item_id).first()
-        )
+        existing_item = db.session.get(MenuItem, item_id)
         if not existing_item:
             raise HTTPException(status_code=404, detail="Menu item not found")
 
         db.session.delete(existing_item)
         db.safe_commit()
+        clear_menu_cache()
         return {"message": f"Menu item with ID {item_id} has been deleted"}
     except HTTPException:
         raise
@@ -325,7 +343,7 @@ async def delete_menu_item(
 
 # API endpoint for add-ons
 @app.get("/addons")
-async def get_addons(
+def get_addons(
     category: str = None, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -364,7 +382,7 @@ class AddOnUpdate(BaseModel):
 
 # Create add-on
 @app.post("/addons")
-async def create_addon(
+def create_addon(
     addon: AddOnCreate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -378,6 +396,7 @@ async def create_addon(
         )
         db.session.add(new_addon)
         db.safe_commit()
+        clear_menu_cache()
         return {
             "id": new_addon.id,
             "name": new_addon.name,
@@ -397,12 +416,12 @@ async def create_addon(
 
 # Update add-on
 @app.put("/addons/{addon_id}")
-async def update_addon(
+def update_addon(
     addon_id: int, addon: AddOnUpdate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
     try:
-        existing_addon = db.session.query(AddOn).filter(AddOn.id == addon_id).first()
+        existing_addon = db.session.get(AddOn, addon_id)
         if not existing_addon:
             raise HTTPException(status_code=404, detail="Add-on not found")
 
@@ -418,6 +437,7 @@ async def update_addon(
             existing_addon.is_available = 1 if addon.is_available else 0
 
         db.safe_commit()
+        clear_menu_cache()
         return {
             "id": existing_addon.id,
             "name": existing_addon.name,
@@ -439,15 +459,16 @@ async def update_addon(
 
 # Delete add-on
 @app.delete("/addons/{addon_id}")
-async def delete_addon(addon_id: int, current_user: User = Depends(get_current_user)):
+def delete_addon(addon_id: int, current_user: User = Depends(get_current_user)):
     db = Database()
     try:
-        existing_addon = db.session.query(AddOn).filter(AddOn.id == addon_id).first()
+        existing_addon = db.session.get(AddOn, addon_id)
         if not existing_addon:
             raise HTTPException(status_code=404, detail="Add-on not found")
 
         db.session.delete(existing_addon)
         db.safe_commit()
+        clear_menu_cache()
         return {"message": f"Add-on with ID {addon_id} has been deleted"}
     except HTTPException:
         raise
@@ -460,7 +481,7 @@ async def delete_addon(addon_id: int, current_user: User = Depends(get_current_u
 
 # API endpoint for orders
 @app.get("/orders")
-async def get_orders(
+def get_orders(
     status: str = None, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -498,7 +519,7 @@ class OrderCreate(BaseModel):
 
 # Create a new order
 @app.post("/orders")
-async def create_order(
+def create_order(
     order_data: OrderCreate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -534,11 +555,11 @@ async def create_order(
 
 # Get order by ID
 @app.get("/orders/{order_id}")
-async def get_order_by_id(
+def get_order_by_id(
     order_id: int, current_user: User = Depends(get_current_user)
 ):
     db = Database()
-    order = db.session.query(Order).filter(Order.id == order_id).first()
+    order = db.session.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -565,7 +586,7 @@ class OrderStatusUpdate(BaseModel):
 
 # Update order status
 @app.put("/orders/{order_id}/status")
-async def update_order_status(
+def update_order_status(
     order_id: int,
     update: OrderStatusUpdate,
     current_user: User = Depends(get_current_user),
@@ -641,7 +662,7 @@ async def update_order_status(
 
 # API endpoint for customers
 @app.get("/customers")
-async def get_customers(current_user: User = Depends(get_current_user)):
+def get_customers(current_user: User = Depends(get_current_user)):
     db = Database()
     # This is a simplified approach - in a real app, you'd implement pagination
     # and more sophisticated querying
@@ -664,7 +685,7 @@ async def get_customers(current_user: User = Depends(get_current_user)):
 
 # Get customer by phone number
 @app.get("/customers/{phone}")
-async def get_customer_by_phone(
+def get_customer_by_phone(
     phone: str, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -683,7 +704,7 @@ class CustomerUpdate(BaseModel):
 
 # Update customer information
 @app.put("/customers/{phone}")
-async def update_customer(
+def update_customer(
     phone: str, customer: CustomerUpdate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
@@ -701,7 +722,7 @@ async def update_customer(
 
 # Get restaurant information
 @app.get("/restaurant")
-async def get_restaurant(current_user: User = Depends(get_current_user)):
+def get_restaurant(current_user: User = Depends(get_current_user)):
     db = Database()
     restaurant = db.get_restaurant()
     if not restaurant:
@@ -720,16 +741,14 @@ class RestaurantUpdate(BaseModel):
 
 # Update restaurant information
 @app.put("/restaurant/{restaurant_id}")
-async def update_restaurant(
+def update_restaurant(
     restaurant_id: int,
     data: RestaurantUpdate,
     current_user: User = Depends(get_current_user),
 ):
     db = Database()
     try:
-        restaurant = (
-            db.session.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-        )
+        restaurant = db.session.get(Restaurant, restaurant_id)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
 
@@ -762,12 +781,12 @@ class TimeUpdate(BaseModel):
 
 
 @app.post("/set-time/{order_id}")
-async def set_order_time(
+def set_order_time(
     order_id: int, time_data: TimeUpdate, current_user: User = Depends(get_current_user)
 ):
     db = Database()
     try:
-        order = db.session.query(Order).filter(Order.id == order_id).first()
+        order = db.session.get(Order, order_id)
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
 
@@ -0,0 +1,123 @@
+"""
+Tests for the deterministic fast paths.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.agent.fast_path import (
+    CONFIRMATION_REPLIES,
+    LOOP_BREAKER_MESSAGE,
+    LOOP_TURN_LIMIT,
+    StateMutationTracker,
+    confirm_regex,
+    confirmation_fast_path,
+)
+
+
+def _request(*utterances, interaction_type="response_required"):
+    transcript = [
+        SimpleNamespace(role=role, content=content) for role, content in utterances
+    ]
+    return SimpleNamespace(interaction_type=interaction_type, transcript=transcript)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "yes",
+        "Yeah.",
+        "yep",
+        "That's right!",
+        "thats correct",
+        "okay",
+        "OK",
+        "sure",
+        " confirmed ",
+    ],
+)
+def test_confirm_regex_accepts_bare_confirmations(text):
+    assert confirm_regex.match(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["yes but change the number", "no", "not right", "yesterday", "ok, add fries"],
+)
+def test_confirm_regex_rejects_anything_more(text):
+    assert not confirm_regex.match(text)
+
+
+def test_fast_path_answers_pending_confirmation():
+    agent = SimpleNamespace(pending_confirmation="phone")
+    request = _request(("agent", "Is 5551234567 your number?"), ("user", "Yes."))
+
+    assert confirmation_fast_path(agent, request) == CONFIRMATION_REPLIES["phone"]
+    assert agent.pending_confirmation is None
+
+
+def test_fast_path_consumes_pending_question_even_without_confirmation():
+    agent = SimpleNamespace(pending_confirmation="phone")
+    request = _request(("user", "No, it's a different number"))
+
+    assert confirmation_fast_path(agent, request) is None
+    assert agent.pending_confirmation is None
+
+
+def test_fast_path_needs_a_pending_question():
+    agent = SimpleNamespace(pending_confirmation=None)
+    assert confirmation_fast_path(agent, _request(("user", "yes"))) is None
+
+
+def test_fast_path_ignores_reminders():
+    agent = SimpleNamespace(pending_confirmation="phone")
+    request = _request(("user", "yes"), interaction_type="reminder_required")
+
+    assert confirmation_fast_path(agent, request) is None
+    assert agent.pending_confirmation == "phone"
+
+
+def _stuck_tracker():
+    tracker = StateMutationTracker()
+    for _ in range(LOOP_TURN_LIMIT):
+        tracker.start_turn()
+    return tracker
+
+
+def test_loop_breaker_forces_order_after_confirmed_summary():
+    transcript = _request(
+        ("agent", "Your order is a Cheeseburger for $9.99. Is that correct?"),
+        ("user", "yes"),
+    ).transcript
+
+    assert _stuck_tracker().loop_breaker(transcript) == (
+        LOOP_BREAKER_MESSAGE,
+        {"type": "function", "function": {"name": "create_order"}},
+    )
+
+
+def test_loop_breaker_without_order_summary_only_nudges():
+    transcript = _request(
+        ("agent", "Is that information correct?"), ("user", "yes")
+    ).transcript
+
+    assert _stuck_tracker().loop_breaker(transcript) == (LOOP_BREAKER_MESSAGE, None)
+
+
+def test_loop_breaker_waits_after_a_recent_tool_call():
+    tracker = _stuck_tracker()
+    tracker.record_tool_call()
+    transcript = _request(
+        ("agent", "Is that information correct?"), ("user", "yes")
+    ).transcript
+
+    assert tracker.loop_breaker(transcript) is None
+
+
+def test_loop_breaker_needs_a_confirmation_answer():
+    transcript = _request(
+        ("agent", "Is that information correct?"), ("user", "no, change it")
+    ).transcript
+
+    assert _stuck_tracker().loop_breaker(transcript) is None
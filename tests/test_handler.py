@@ -0,0 +1,76 @@
+"""
+Tests for the OrderAgent function handlers.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.agent.handler import handle_function_call
+
+
+class CountingDatabase:
+    """Stands in for Database and counts menu lookups."""
+
+    def __init__(self, item):
+        self.item = item
+        self.lookups = 0
+
+    def find_similar_menu_item(self, item_name, category=None):
+        self.lookups += 1
+        return self.item
+
+
+def _create_response(response_id, content, content_complete=True, end_call=False):
+    return SimpleNamespace(
+        response_id=response_id,
+        content=content,
+        content_complete=content_complete,
+        end_call=end_call,
+    )
+
+
+def _agent(db):
+    return SimpleNamespace(
+        db=db,
+        conversation_id="test",
+        tool_cache={},
+        create_response=_create_response,
+    )
+
+
+def _call(agent, func_name, arguments):
+    async def collect():
+        func_call = {"id": "call", "func_name": func_name, "arguments": {}}
+        request = SimpleNamespace(response_id=1)
+        return [
+            response
+            async for response in handle_function_call(
+                agent, request, func_call, json.dumps(arguments)
+            )
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_repeated_verify_menu_item_skips_database():
+    burger = SimpleNamespace(name="Cheeseburger", base_price=9.99, is_available=1)
+    db = CountingDatabase(burger)
+    agent = _agent(db)
+
+    first = _call(agent, "verify_menu_item", {"item_name": "cheeseburger"})
+    second = _call(agent, "verify_menu_item", {"item_name": "cheeseburger"})
+
+    assert db.lookups == 1
+    assert [r.content for r in first] == [r.content for r in second]
+    assert "Cheeseburger ($9.99)" in first[0].content
+
+
+def test_different_arguments_are_looked_up_again():
+    db = CountingDatabase(None)
+    agent = _agent(db)
+
+    _call(agent, "verify_menu_item", {"item_name": "cheeseburger"})
+    _call(agent, "verify_menu_item", {"item_name": "pizza"})
+
+    assert db.lookups == 2
@@ -0,0 +1,77 @@
+"""
+Tests for matching spoken item names against the menu.
+"""
+
+from types import SimpleNamespace
+
+from app.agent.menu_index import AddOnMatcher, MenuNameIndex
+
+
+def _item(id, name, category, is_available=1):
+    return SimpleNamespace(
+        id=id, name=name, category=category, is_available=is_available
+    )
+
+
+MARGHERITA = _item(1, "Margherita Pizza", "Pizza")
+PEPPERONI = _item(2, "Pepperoni Pizza", "Pizza")
+CHEESEBURGER = _item(3, "Cheeseburger", "Burger")
+COKE = _item(4, "Coke", "Drink")
+SOLD_OUT = _item(5, "Veggie Burger", "Burger", is_available=0)
+
+MENU = MenuNameIndex([MARGHERITA, PEPPERONI, CHEESEBURGER, COKE, SOLD_OUT])
+
+
+def test_exact_names_map_to_available_items_only():
+    assert MENU.available_by_name["coke"] is COKE
+    assert "veggie burger" not in MENU.available_by_name
+
+
+def test_candidates_cover_every_substring_match():
+    names = [name for _, name, _ in MENU.candidates("large margherita pizza please")]
+    assert "margherita pizza" in names
+    assert "coke" not in names
+
+
+def test_matches_prefers_substring_matches_in_menu_order():
+    assert MENU.matches("pizza") == [MARGHERITA, PEPPERONI]
+    assert MENU.matches("a cheeseburger with fries") == [CHEESEBURGER]
+
+
+def test_matches_filters_by_category_and_availability():
+    assert MENU.matches("coke", "pizza") == []
+    assert MENU.matches("veggie burger") == []
+
+
+def test_matches_tolerates_misspellings():
+    assert MENU.matches("margarita piza")[0] is MARGHERITA
+    assert MENU.matches("cheesburger")[0] is CHEESEBURGER
+
+
+def test_matches_gives_up_on_unrelated_names():
+    assert MENU.matches("tiramisu") == []
+
+
+BACON = SimpleNamespace(id=1, name="Bacon", price=1.5)
+JALAPENOS = SimpleNamespace(id=2, name="Jalapenos", price=0.75)
+EXTRA_CHEESE = SimpleNamespace(id=3, name="Extra Cheese", price=1.0)
+
+ADD_ONS = AddOnMatcher([BACON, JALAPENOS, EXTRA_CHEESE])
+
+
+def test_add_on_exact_name():
+    assert ADD_ONS.match("bacon") == (BACON, False)
+    assert ADD_ONS.match("extra cheese") == (EXTRA_CHEESE, False)
+
+
+def test_add_on_inside_a_longer_phrase_keeps_modifiers():
+    assert ADD_ONS.match("extra bacon") == (BACON, True)
+
+
+def test_add_on_misspelling():
+    assert ADD_ONS.match("jalapenoes") == (JALAPENOS, False)
+
+
+def test_add_on_unknown_name():
+    assert ADD_ONS.match("pineapple") == (None, False)
+    assert AddOnMatcher([]).match("bacon") == (None, False)
@@ -0,0 +1,51 @@
+"""
+Guards the static system prompt prefix that the provider's prompt cache matches on.
+An edit to the prompt texts, even whitespace, starts a new cache; these tests make
+that change show up in review instead of silently lowering the cache hit rate.
+"""
+
+import difflib
+import hashlib
+
+from app.agent.prompts import (
+    AGENT_PROMPT_STATIC,
+    PROMPT_HASHES,
+    render_system_prompt,
+)
+
+# Update deliberately, together with the prompt edit that changes it
+EXPECTED_STATIC_HASH = "f5a0db6fd9b9ebfa7eb48f69807e4d144f9bd7f9544b8c3485ae001721f4bbf5"
+
+
+def _prefix_diff(expected, actual):
+    """Return a unified diff of the first lines where actual departs from expected."""
+    return "\n".join(
+        difflib.unified_diff(
+            expected.splitlines(),
+            actual[: len(expected)].splitlines(),
+            fromfile="AGENT_PROMPT_STATIC",
+            tofile="rendered system message",
+            lineterm="",
+        )
+    )
+
+
+def test_static_prompt_hash_is_pinned():
+    actual = hashlib.sha256(AGENT_PROMPT_STATIC.encode("utf-8")).hexdigest()
+    assert PROMPT_HASHES["static"] == actual
+    assert actual == EXPECTED_STATIC_HASH, (
+        "The static system prompt changed, which invalidates the provider prompt "
+        f"cache for every call. If this is intended, set EXPECTED_STATIC_HASH to {actual}"
+    )
+
+
+def test_static_prompt_is_byte_prefix_of_system_message():
+    static = AGENT_PROMPT_STATIC.encode("utf-8")
+    for restaurant_name, menu_info in [
+        ("Tote AI Restaurant", "## Our Delicious Menu\n"),
+        ("Another Place", "## Our Delicious Menu\n### Burgers\n- Cheeseburger: $9.99"),
+    ]:
+        system_message = render_system_prompt(restaurant_name, menu_info)
+        assert system_message.encode("utf-8").startswith(static), _prefix_diff(
+            AGENT_PROMPT_STATIC, system_message
+        )
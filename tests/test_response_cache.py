@@ -0,0 +1,70 @@
+"""
+Tests for the OrderAgent response cache.
+"""
+
+from app.agent.response_cache import ResponseCache, normalize
+
+STATE = "tag|greet|"
+
+
+def test_normalize_ignores_case_spacing_and_trailing_punctuation():
+    assert normalize("  Yes,  that's RIGHT!! ") == "yes, that's right"
+    assert normalize("Show me the menu.") == normalize("show me   the menu")
+
+
+def test_key_shared_by_trivial_variations():
+    cache = ResponseCache()
+    question = "Would you like to hear our menu?"
+    assert cache.make_key("Sure.", question, STATE) == cache.make_key(
+        "sure", question, STATE
+    )
+
+
+def test_key_depends_on_conversation_state():
+    cache = ResponseCache()
+    question = "Would you like to hear our menu?"
+    key = cache.make_key("yes", question, STATE)
+
+    assert key != cache.make_key("yes", question, "tag|ordering|phone")
+    assert key != cache.make_key("yes", question, "other-prompt|greet|")
+    assert key != cache.make_key("yes", "Is that your complete order?", STATE)
+
+
+def test_long_or_empty_utterances_are_not_replayable():
+    cache = ResponseCache()
+    assert cache.make_key("", "", STATE) is None
+    assert cache.make_key("I'd like two cheeseburgers please", "", STATE) is None
+
+
+def test_get_returns_stored_reply_and_counts_lookups():
+    cache = ResponseCache()
+    key = cache.make_key("yes", "", STATE)
+
+    assert cache.get(key) is None
+    cache.put(key, "Here is our menu.")
+    assert cache.get(key) == "Here is our menu."
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(maxsize=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+
+    assert list(cache.entries) == ["a", "c"]
+
+
+def test_put_skips_replies_with_a_tool_call():
+    cache = ResponseCache()
+    key = cache.make_key("yes", "", STATE)
+
+    cache.put(key, "Placing your order now.", {"func_name": "create_order"})
+    assert cache.get(key) is None
+
+
+def test_put_skips_turns_without_a_key():
+    cache = ResponseCache()
+    cache.put(None, "Anything")
+    assert not cache.entries
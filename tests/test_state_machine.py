@@ -0,0 +1,56 @@
+"""
+Tests for the conversation state machine.
+"""
+
+from types import SimpleNamespace
+
+from app.agent.state_machine import State, current_state, tools_for
+
+
+def _agent(customer_identified=False, current_order=None):
+    return SimpleNamespace(
+        customer_identified=customer_identified, current_order=current_order
+    )
+
+
+def _tool_names(agent):
+    return {tool["function"]["name"] for tool in tools_for(current_state(agent))}
+
+
+def test_greet_allows_menu_lookups_but_not_ordering():
+    agent = _agent()
+    assert current_state(agent) is State.GREET
+    assert _tool_names(agent) == {
+        "verify_customer",
+        "collect_customer_info",
+        "get_order_history",
+        "verify_menu_item",
+        "get_item_addons",
+        "end_call",
+    }
+
+
+def test_ordering_once_customer_is_identified():
+    agent = _agent(customer_identified=True)
+    assert current_state(agent) is State.ORDERING
+    assert _tool_names(agent) == {
+        "collect_customer_info",
+        "get_order_history",
+        "verify_menu_item",
+        "get_item_addons",
+        "create_order",
+        "end_call",
+    }
+
+
+def test_placed_keeps_menu_lookups_for_order_changes():
+    agent = _agent(customer_identified=True, current_order=object())
+    assert current_state(agent) is State.PLACED
+    assert _tool_names(agent) == {
+        "collect_customer_info",
+        "get_order_history",
+        "verify_menu_item",
+        "get_item_addons",
+        "create_order",
+        "end_call",
+    }
@@ -0,0 +1,50 @@
+"""
+Tests for the OrderAgent tool definitions.
+"""
+
+from app.agent.tools import constrain_add_ons, get_tool_definitions
+
+EXPECTED_TOOL_NAMES = [
+    "verify_customer",
+    "collect_customer_info",
+    "get_order_history",
+    "verify_menu_item",
+    "create_order",
+    "end_call",
+    "get_item_addons",
+]
+
+
+def _add_on_items(tools):
+    create_order = next(t for t in tools if t["function"]["name"] == "create_order")
+    order_item = create_order["function"]["parameters"]["properties"]["order_items"]
+    return order_item["items"]["properties"]["add_ons"]["items"]
+
+
+def test_tool_names():
+    names = [tool["function"]["name"] for tool in get_tool_definitions()]
+    assert names == EXPECTED_TOOL_NAMES
+
+
+def test_tool_definitions_are_shared_and_immutable():
+    tools = get_tool_definitions()
+    assert isinstance(tools, tuple)
+    assert get_tool_definitions() is tools
+
+
+def test_constrain_add_ons_restricts_only_create_order():
+    tools = get_tool_definitions()
+    constrained = constrain_add_ons(tools, ["Bacon", "Cheese"])
+
+    assert [t["function"]["name"] for t in constrained] == EXPECTED_TOOL_NAMES
+    assert _add_on_items(constrained) == {"type": "string", "enum": ["Bacon", "Cheese"]}
+    # The shared definitions are copied, never modified in place
+    assert "enum" not in _add_on_items(tools)
+    for original, copied in zip(tools, constrained):
+        if original["function"]["name"] != "create_order":
+            assert copied is original
+
+
+def test_constrain_add_ons_without_add_ons_leaves_schema_free_form():
+    tools = get_tool_definitions()
+    assert constrain_add_ons(tools, []) == tuple(tools)